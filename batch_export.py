@@ -0,0 +1,181 @@
+"""Module d'export non interactif de calendriers à partir d'un manifeste.
+
+Un manifeste est un fichier JSON (liste d'objets, ou objet avec une clé
+"exports") ou TOML (tables [[exports]]) dont chaque entrée contient :
+entity, type (module/room/group, défaut group), period (day/week/month/year,
+défaut week), date (défaut aujourd'hui), output (défaut
+calendars/<entity>-<period>_<date>.ics) et compress (gzip, défaut false).
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from celcat2ics import (
+    PERIOD_TO_VIEW,
+    RES_TYPES,
+    calendar_json_to_events,
+    compute_range,
+    stream_events,
+)
+from ics_utils import events_to_ics
+from planner import FetchPlanner
+
+DEFAULT_WORKERS = 4
+
+
+def load_manifest(path):
+    """Charge les entrées d'un manifeste JSON ou TOML.
+
+    Chaque entrée est validée séparément : une entrée invalide est gardée
+    sous la forme {"index", "error"} pour être signalée par run_manifest,
+    sans empêcher l'export des autres. Un fichier illisible lève OSError
+    ou ValueError.
+    """
+    if path.endswith(".toml"):
+        import tomllib  # pylint: disable=import-outside-toplevel
+
+        with open(path, "rb") as f:
+            data = tomllib.load(f)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("exports", [])
+    if not isinstance(data, list):
+        raise ValueError("le manifeste doit contenir une liste d'entrées")
+    today = datetime.now().date().isoformat()
+    items = []
+    for i, raw in enumerate(data):
+        try:
+            items.append(parse_entry(raw, today))
+        except ValueError as err:
+            items.append({"index": i, "error": str(err)})
+    return items
+
+
+def parse_entry(raw, today):
+    """Valide une entrée brute du manifeste et la complète des valeurs par défaut."""
+    if not isinstance(raw, dict) or not raw.get("entity"):
+        raise ValueError(f"entrée invalide : {raw!r}")
+    item = {
+        "entity": str(raw["entity"]),
+        "type": raw.get("type", "group"),
+        "period": raw.get("period", "week"),
+        "date": str(raw.get("date", today)),
+        "compress": bool(raw.get("compress", False)),
+    }
+    if item["type"] not in RES_TYPES:
+        raise ValueError(f"type inconnu {item['type']!r}")
+    if item["period"] not in PERIOD_TO_VIEW:
+        raise ValueError(f"période inconnue {item['period']!r}")
+    try:
+        datetime.fromisoformat(item["date"])
+    except ValueError:
+        raise ValueError(f"date invalide {item['date']!r}") from None
+    default_out = f"{item['entity']}-{item['period']}_{item['date']}.ics"
+    if item["compress"]:
+        default_out += ".gz"
+    item["output"] = raw.get("output") or os.path.join("calendars", default_out)
+    return item
+
+
+def item_label(item):
+    """Libellé d'une entrée dans le bilan."""
+    if "error" in item:
+        return f"entrée {item['index']}"
+    return f"{item['type']} {item['entity']} ({item['period']} {item['date']})"
+
+
+def plan_manifest(items):
+    """Récupère ensemble les données des entrées hors année (voir planner).
+
+    Les plages d'une même entité sont fusionnées et les entités de même
+    type regroupées ; retourne {indice de l'entrée: événements bruts ou
+    exception}. Les exports annuels restent en flux (stream_events).
+    """
+    planner = FetchPlanner()
+    needs = {}
+    for i, item in enumerate(items):
+        if "error" in item or item["period"] == "year":
+            continue
+        start, end = compute_range(item["period"], item["date"])
+        needs[i] = planner.add(
+            RES_TYPES[item["type"]],
+            item["entity"],
+            start,
+            end,
+            PERIOD_TO_VIEW[item["period"]],
+        )
+    results = planner.run()
+    return {i: results[need] for i, need in needs.items()}
+
+
+def export_item(item, data=None):
+    """Exporte une entrée du manifeste ; retourne (événements, octets écrits).
+
+    `data` sont les événements bruts déjà récupérés par plan_manifest (ou
+    l'exception de leur requête) ; sans eux, l'entrée est récupérée seule.
+    """
+    if isinstance(data, Exception):
+        raise data
+    if data is not None:
+        events = calendar_json_to_events(data, [item["entity"]])
+    else:
+        entities = [(item["type"], item["entity"])]
+        events = stream_events(item["period"], item["date"], entities)
+    count = 0
+
+    def counted():
+        nonlocal count
+        for ev in events:
+            count += 1
+            yield ev
+
+    events_to_ics(counted(), out_path=item["output"], compress=item["compress"])
+    return count, os.path.getsize(item["output"])
+
+
+def run_manifest(items, workers=DEFAULT_WORKERS, out=print):
+    """Exporte toutes les entrées en parallèle et affiche un bilan.
+
+    Une entrée invalide ou en échec est signalée sans interrompre les
+    autres. Retourne le nombre d'échecs.
+    """
+    t0 = time.perf_counter()
+    n_events = 0
+    n_bytes = 0
+    failures = 0
+    planned = plan_manifest(items)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = []
+        for i, item in enumerate(items):
+            if "error" not in item:
+                futures.append((item, pool.submit(export_item, item, planned.get(i))))
+            else:
+                futures.append((item, None))
+        for item, future in futures:
+            label = item_label(item)
+            if future is None:
+                failures += 1
+                out(f"✘ {label} : {item['error']}")
+                continue
+            try:
+                events, size = future.result()
+            except Exception as err:  # pylint: disable=broad-exception-caught
+                failures += 1
+                out(f"✘ {label} : {err}")
+                continue
+            n_events += events
+            n_bytes += size
+            out(f"✓ {label} → {item['output']} ({events} événements)")
+    elapsed = max(time.perf_counter() - t0, 1e-9)
+    done = len(items) - failures
+    out(
+        f"{done}/{len(items)} calendriers en {elapsed:.2f} s — "
+        f"{done / elapsed:.1f} entités/s, {n_events / elapsed:.0f} événements/s, "
+        f"{n_bytes} octets écrits"
+    )
+    return failures
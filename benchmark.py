@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""Benchmarks des scripts contre un faux serveur CELCAT local.
+
+Chaque scénario est exécuté contre fake_celcat (latence et taille des
+réponses configurables) et produit un résultat JSON : durée, nombre de
+requêtes, octets reçus, pic d'allocation Python du scénario (tracemalloc)
+et débit en événements (ou salles) par seconde.
+Le scénario startup vérifie le budget de temps d'import de main.py,
+ics_identity que l'écriture en fichier et ics_bytes donnent les mêmes
+octets, et search que la commande réussit depuis un lundi (code de sortie
+1 en cas d'échec).
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import cache
+import fake_celcat
+import transport
+from celcat2ics import (
+    YEAR_WORKERS,
+    academic_year_months,
+    calendar_json_to_events,
+    fetch_events,
+    iter_year_events,
+)
+from fetch_rooms import get_rooms
+from ics_utils import events_to_ics, ics_bytes, read_ics_state
+from room_availability import print_availability
+from room_config import load_config
+
+SCENARIOS = (
+    "convert",
+    "availability",
+    "year",
+    "rooms",
+    "ics_write",
+    "ics_identity",
+    "search",
+    "startup",
+    "year_memory",
+)
+STARTUP_BUDGET_MS = 50
+# Export annuel en flux : densité des données, croissance et pic tolérés.
+YEAR_MEMORY_EVENTS_PER_DAY = 60
+YEAR_MEMORY_GROWTH = 1.5
+YEAR_MEMORY_LIMIT_KIB = 24 * 1024
+# Sous-systèmes qui ne doivent pas être chargés par le seul point d'entrée.
+LAZY_MODULES = ("celcat2ics", "transport", "cache", "http.client", "sqlite3", "numpy")
+
+
+def synthetic_items(n, start="2025-09-01T08:00:00"):
+    """Génère `n` événements CELCAT bruts réalistes."""
+    base = datetime.fromisoformat(start)
+    items = []
+    for i in range(n):
+        s = base + timedelta(hours=(i % 10) + 24 * (i // 10))
+        items.append(
+            {
+                "id": f"-{1000000 + i}",
+                "start": s.isoformat(),
+                "end": (s + timedelta(hours=1, minutes=30)).isoformat(),
+                "eventCategory": "CM" if i % 3 else "TD",
+                "modules": [f"MOD{i % 40:03d}"],
+                "sites": ["Versailles"],
+                "backgroundColor": "#FF8080",
+                "description": (
+                    "\r\n\r\nCM<br />\r\n\r\n"
+                    f"{100 + i % 60} - DESCARTES (MASTER)<br />\r\n\r\n"
+                    f"M1 Groupe {i % 8}<br />\r\n\r\n"
+                    f"MOD{i % 40:03d} - Module {i % 40}<br />\r\n\r\n"
+                    "Enseignant Exemple<br />\r\n"
+                ),
+            }
+        )
+    return items
+
+
+def traced_peak_kib(fn):
+    """Pic d'allocation Python (tracemalloc) pendant `fn()`, en Kio."""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] // 1024
+    finally:
+        tracemalloc.stop()
+
+
+def measure(name, fake, fn, trace=True):
+    """Exécute un scénario et retourne ses mesures.
+
+    Avec `trace`, le scénario est exécuté une seconde fois sous tracemalloc
+    pour son propre pic d'allocation Python (le RSS maximal, commun à tout
+    le processus, ne distinguerait pas les scénarios).
+    """
+    if fake is not None:
+        fake.reset_counters()
+    t0 = time.perf_counter()
+    events = fn()
+    elapsed = time.perf_counter() - t0
+    result = {
+        "scenario": name,
+        "seconds": round(elapsed, 4),
+        "events": events,
+        "events_per_s": round(events / elapsed) if elapsed and events else 0,
+    }
+    if fake is not None:
+        result["requests"] = fake.requests
+        result["bytes_received"] = fake.bytes_sent
+    if trace:
+        result["peak_alloc_kib"] = traced_peak_kib(fn)
+    return result
+
+
+def bench_convert(n, repeat=5, read_details=False):
+    """Mesure le débit de calendar_json_to_events (événements/s)."""
+    items = synthetic_items(n)
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        events = calendar_json_to_events(items, ["M1"])
+        if read_details:
+            for ev in events:
+                ev.get("details")
+                ev.get("salle")
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return {
+        "scenario": "convert+read" if read_details else "convert",
+        "events": n,
+        "seconds": round(best, 4),
+        "events_per_s": round(n / best),
+    }
+
+
+def scenario_availability(fake, workdir, rooms, date):
+    """Disponibilité matin/après-midi d'une config de `rooms` salles."""
+    cfg = os.path.join(workdir, "rooms_bench.txt")
+    with open(cfg, "w", encoding="utf-8") as f:
+        f.write("# Benchmark\n")
+        for i in range(rooms):
+            f.write(fake.room_name(i) + "\n")
+
+    def fn():
+        with contextlib.redirect_stdout(io.StringIO()):
+            print_availability(date, load_config(cfg), 0)
+        return rooms
+
+    return measure(f"availability[{rooms} salles]", fake, fn)
+
+
+def scenario_search(fake, workdir, rooms, first="2025-10-06"):
+    """Commande `search` de main.py sur une semaine, avec la fin par défaut.
+
+    `first` est un lundi : la fin calculée ne doit pas tomber un dimanche
+    (« ok » à false si la commande échoue).
+    """
+    cfg = os.path.join(workdir, "rooms_search.txt")
+    with open(cfg, "w", encoding="utf-8") as f:
+        f.writelines(fake.room_name(i) + "\n" for i in range(rooms))
+    main_py = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    command = [sys.executable, main_py, "--no-cache", "--upstream", fake.base_url]
+    command += ["search", cfg, "--from", first]
+    proc = None
+
+    def fn():
+        nonlocal proc
+        proc = subprocess.run(
+            command, cwd=workdir, capture_output=True, text=True, check=False
+        )
+        return rooms
+
+    # La commande tourne dans un sous-processus : pas de mesure tracemalloc.
+    result = measure(f"search[{rooms} salles, {first}]", fake, fn, trace=False)
+    result["returncode"] = proc.returncode
+    result["ok"] = proc.returncode == 0
+    return result
+
+
+def scenario_year(fake, workdir, date):
+    """Export .ics d'une année universitaire complète."""
+
+    def fn():
+        events = fetch_events("year", date, "group", "M1 Informatique")
+        events_to_ics(events, out_path=os.path.join(workdir, "year.ics"))
+        return len(events)
+
+    return measure("year", fake, fn)
+
+
+def scenario_year_memory(
+    fake,
+    workdir,
+    date,
+    workers=YEAR_WORKERS,
+    events_per_day=YEAR_MEMORY_EVENTS_PER_DAY,
+    limit_kib=YEAR_MEMORY_LIMIT_KIB,
+):
+    """Pic mémoire de l'export annuel en flux quand l'année s'allonge.
+
+    L'export est mesuré deux fois à densité égale : avec des événements sur
+    les workers + 1 premiers mois de l'année universitaire (autant de mois
+    pleins que le flux en garde à la fois), puis sur les 12. En flux, la
+    mémoire tient workers + 1 mois de réponses, plus l'ensemble des
+    identifiants déjà vus et, si le fichier existe déjà, l'état
+    read_ics_state des événements précédents (empreinte, DTSTAMP, SEQUENCE
+    par UID) : ces deux derniers croissent avec le nombre d'événements,
+    mais de quelques centaines d'octets par événement. Le scénario échoue
+    si le pic en flux croît de plus de YEAR_MEMORY_GROWTH entre les deux
+    mesures, ou si un pic (régénération comprise) dépasse `limit_kib` ;
+    l'export entièrement en mémoire est mesuré pour comparaison.
+    """
+    entity = ["M1 Informatique"]
+    out_path = os.path.join(workdir, "year_stream.ics")
+
+    def streamed():
+        events_to_ics(iter_year_events(date, 103, entity, workers), out_path=out_path)
+
+    def materialized():
+        ics_bytes(fetch_events("year", date, "group", entity[0]))
+
+    saved = fake.events_per_day, fake.months
+    fake.events_per_day = events_per_day
+    result = {"scenario": "year_memory", "events_per_day": events_per_day}
+    try:
+        months = [m for _, m in academic_year_months(date)]
+        for label, active in (("short", months[: workers + 1]), ("year", months)):
+            fake.months = set(active)
+            if os.path.exists(out_path):
+                os.remove(out_path)
+            result[f"stream_peak_kib_{label}"] = traced_peak_kib(streamed)
+            result[f"events_{label}"] = len(read_ics_state(out_path))
+            result[f"materialized_peak_kib_{label}"] = traced_peak_kib(materialized)
+        result["regenerate_peak_kib_year"] = traced_peak_kib(streamed)
+    finally:
+        fake.events_per_day, fake.months = saved
+    small, large = result["stream_peak_kib_short"], result["stream_peak_kib_year"]
+    result["growth"] = round(large / max(1, small), 2)
+    result["limit_kib"] = limit_kib
+    result["ok"] = (
+        result["growth"] <= YEAR_MEMORY_GROWTH
+        and max(large, result["regenerate_peak_kib_year"]) <= limit_kib
+    )
+    return result
+
+
+def scenario_rooms(fake):
+    """Récupération de la liste des salles."""
+    return measure("rooms", fake, lambda: len(get_rooms()))
+
+
+def scenario_ics_write(workdir, n):
+    """Écriture d'un .ics de `n` événements."""
+    events = calendar_json_to_events(synthetic_items(n), ["M1"])
+
+    def fn():
+        events_to_ics(events, out_path=os.path.join(workdir, "big.ics"))
+        return n
+
+    return measure(f"ics_write[{n}]", None, fn)
+
+
+def scenario_ics_identity(workdir, n):
+    """Vérifie que le fichier écrit et ics_bytes produisent les mêmes octets.
+
+    Le calendrier est régénéré avec l'état du fichier écrit, pour que les
+    DTSTAMP soient identiques ; la comparaison est faite en clair et gzippé.
+    """
+    events = calendar_json_to_events(synthetic_items(n), ["M1"])
+    checks = {}
+    for compress, name in ((False, "plain.ics"), (True, "plain.ics.gz")):
+        path = events_to_ics(events, os.path.join(workdir, name), compress)
+        with open(path, "rb") as f:
+            written = f.read()
+        streamed = ics_bytes(events, read_ics_state(path), compress)
+        checks["gzip" if compress else "plain"] = written == streamed
+    return {"scenario": f"ics_identity[{n}]", **checks, "ok": all(checks.values())}
+
+
+def import_times(module):
+    """Durées d'import (µs, cumulées) de `module` et de ses dépendances."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def scenario_startup(budget_ms=STARTUP_BUDGET_MS, repeat=5):
+    """Temps d'import du point d'entrée main.py (meilleur de `repeat`).
+
+    Le scénario échoue (« ok » à false) si le budget est dépassé ou si un
+    sous-système de LAZY_MODULES est importé au démarrage.
+    """
+    best = None
+    loaded = set()
+    for _ in range(repeat):
+        times = import_times("main")
+        best = times["main"] if best is None else min(best, times["main"])
+        loaded.update(name for name in LAZY_MODULES if name in times)
+    ms = best / 1000
+    return {
+        "scenario": "startup",
+        "import_ms": round(ms, 2),
+        "budget_ms": budget_ms,
+        "eager_modules": sorted(loaded),
+        "ok": ms <= budget_ms and not loaded,
+    }
+
+
+def main(argv=None):
+    """Point d'entrée : affiche les résultats en JSON."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "scenarios", nargs="*", help=f"parmi {', '.join(SCENARIOS)} (défaut : tous)"
+    )
+    parser.add_argument("--events", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--rooms", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--events-per-day", type=int, default=4)
+    parser.add_argument("--padding", type=int, default=0)
+    parser.add_argument("--date", default="2025-10-06")
+    parser.add_argument(
+        "--startup-budget",
+        type=float,
+        default=STARTUP_BUDGET_MS,
+        help="budget d'import de main.py en ms (scénario startup)",
+    )
+    parser.add_argument("-o", "--output", help="fichier JSON de résultats")
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"scénario inconnu : {', '.join(sorted(unknown))}")
+    scenarios = args.scenarios or list(SCENARIOS)
+
+    cache.configure(enabled=False)
+    fake = fake_celcat.start(
+        latency=args.latency,
+        events_per_day=args.events_per_day,
+        padding=args.padding,
+        rooms=args.rooms,
+    )
+    transport.configure(base_url=fake.base_url)
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in scenarios:
+            if name == "convert":
+                results.append(bench_convert(args.events, args.repeat))
+                results.append(bench_convert(args.events, args.repeat, True))
+            elif name == "availability":
+                results.append(
+                    scenario_availability(fake, workdir, args.rooms, args.date)
+                )
+            elif name == "search":
+                results.append(scenario_search(fake, workdir, args.rooms))
+            elif name == "year":
+                results.append(scenario_year(fake, workdir, args.date))
+            elif name == "rooms":
+                results.append(scenario_rooms(fake))
+            elif name == "ics_write":
+                results.append(scenario_ics_write(workdir, args.events))
+            elif name == "ics_identity":
+                results.append(scenario_ics_identity(workdir, min(args.events, 1000)))
+            elif name == "year_memory":
+                results.append(scenario_year_memory(fake, workdir, args.date))
+            elif name == "startup":
+                results.append(scenario_startup(args.startup_budget, args.repeat))
+    fake.shutdown()
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+    return 0 if all(r.get("ok", True) for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
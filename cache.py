@@ -0,0 +1,183 @@
+"""Module de cache local (SQLite) pour les réponses GetCalendarData de CELCAT."""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import date
+
+CACHE_DIR = "cache"
+CACHE_PATH = os.path.join(CACHE_DIR, "celcat.sqlite")
+FUTURE_TTL = 15 * 60
+PREFETCH_TTL = 2 * 3600
+MAX_ENTRIES = 5000
+
+_settings = {"enabled": True, "refresh": False, "future_ttl": FUTURE_TTL}
+_instance = None
+_instance_lock = threading.Lock()
+_oldest_served = None
+_served_lock = threading.Lock()
+
+
+def configure(enabled=True, refresh=False, future_ttl=FUTURE_TTL):
+    """Active/désactive le cache ou force le rafraîchissement (--no-cache/--refresh).
+
+    `future_ttl` est la durée de validité des plages à venir (plus longue
+    pour le préchargement).
+    """
+    _settings["enabled"] = enabled
+    _settings["refresh"] = refresh
+    _settings["future_ttl"] = future_ttl
+
+
+@contextmanager
+def overridden(**changes):
+    """Modifie des réglages du cache (voir configure) le temps d'un bloc.
+
+    Les réglages non donnés, dont `enabled` (--no-cache), sont conservés ;
+    tous sont rétablis à la sortie du bloc.
+    """
+    saved = dict(_settings)
+    _settings.update(changes)
+    try:
+        yield
+    finally:
+        _settings.clear()
+        _settings.update(saved)
+
+
+def get_cache():
+    """Retourne le cache partagé, ou None s'il est désactivé."""
+    global _instance  # pylint: disable=global-statement
+    if not _settings["enabled"]:
+        return None
+    with _instance_lock:
+        if _instance is None:
+            _instance = CalendarCache()
+        return _instance
+
+
+def refresh_requested():
+    """Indique si les entrées en cache doivent être ignorées en lecture."""
+    return _settings["refresh"]
+
+
+def note_served(stored):
+    """Mémorise la date de la plus ancienne donnée servie depuis reset_freshness()."""
+    global _oldest_served  # pylint: disable=global-statement
+    with _served_lock:
+        if _oldest_served is None or stored < _oldest_served:
+            _oldest_served = stored
+
+
+def reset_freshness():
+    """Oublie les données servies (avant une nouvelle requête interactive)."""
+    global _oldest_served  # pylint: disable=global-statement
+    with _served_lock:
+        _oldest_served = None
+
+
+def oldest_served():
+    """Date (timestamp) de la plus ancienne donnée servie, ou None."""
+    with _served_lock:
+        return _oldest_served
+
+
+def make_key(start, end, res_type, cal_view, federation_ids):
+    """Construit la clé de cache d'une requête GetCalendarData."""
+    ids = "\x1f".join(sorted(str(fid) for fid in federation_ids))
+    return f"{start}|{end}|{res_type}|{cal_view}|{ids}"
+
+
+def ttl_for(end):
+    """Durée de validité d'une plage : illimitée si elle est passée, courte sinon."""
+    try:
+        end_day = date.fromisoformat(str(end)[:10])
+    except ValueError:
+        return _settings["future_ttl"]
+    if end_day < date.today():
+        return None
+    return _settings["future_ttl"]
+
+
+class CalendarCache:
+    """Cache clé/valeur des réponses JSON, borné en nombre d'entrées (LRU)."""
+
+    def __init__(self, path=CACHE_PATH, max_entries=MAX_ENTRIES):
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " data BLOB NOT NULL,"
+            " stored REAL NOT NULL,"
+            " expires REAL,"
+            " accessed REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+        )
+        self._db.commit()
+
+    def get(self, key):
+        """Retourne la réponse en cache, ou None si absente ou expirée."""
+        entry = self.get_entry(key)
+        return None if entry is None else entry[0]
+
+    def get_entry(self, key):
+        """Retourne (réponse, date d'enregistrement), ou None si absente ou expirée."""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data, expires, stored FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] is not None and row[1] <= now:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute(
+                "UPDATE responses SET accessed = ? WHERE key = ?", (now, key)
+            )
+            self._db.commit()
+        return json.loads(zlib.decompress(row[0]).decode("utf-8")), row[2]
+
+    def put(self, key, data, ttl):
+        """Enregistre une réponse ; `ttl` None signifie sans expiration."""
+        now = time.time()
+        blob = zlib.compress(json.dumps(data).encode("utf-8"))
+        expires = None if ttl is None else now + ttl
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, blob, now, expires, now),
+            )
+            self._evict(now)
+            self._db.commit()
+
+    def _evict(self, now):
+        """Supprime les entrées expirées puis les moins récemment utilisées."""
+        self._db.execute(
+            "DELETE FROM responses WHERE expires IS NOT NULL AND expires <= ?", (now,)
+        )
+        (count,) = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()
+        if count > self.max_entries:
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def clear(self):
+        """Vide le cache."""
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
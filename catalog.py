@@ -0,0 +1,176 @@
+"""Module de catalogue local des salles CELCAT (persistance et index).
+
+Le catalogue complet (toutes les pages de ReadResourceListItems) est gardé
+dans cache/rooms_catalog.json et rafraîchi après CATALOG_TTL secondes. Il
+est indexé par département et par nom normalisé (espaces et casse), chaque
+entrée renvoyant l'identifiant CELCAT exact, espaces compris. Les configs
+de salles et les entités de type salle sont résolues hors ligne avec la
+copie locale (local_catalog).
+"""
+
+import json
+import os
+import threading
+import time
+
+from fetch_rooms import get_rooms
+
+CATALOG_PATH = os.path.join("cache", "rooms_catalog.json")
+CATALOG_TTL = 7 * 24 * 3600
+
+_local = {}
+_local_lock = threading.Lock()
+
+
+def normalize_name(name):
+    """Normalise un nom de salle (espaces multiples et casse) pour la recherche."""
+    return " ".join(str(name).split()).casefold()
+
+
+def room_department(room):
+    """Département d'une salle du catalogue, ou None."""
+    dept = None
+    if isinstance(room, dict):
+        raw = room.get("raw")
+        if isinstance(raw, dict):
+            dept = raw.get("dept")
+        if not dept:
+            dept = room.get("dept")
+    return str(dept).strip() if dept else None
+
+
+class RoomCatalog:
+    """Liste des salles et ses index (département, nom normalisé)."""
+
+    def __init__(self, rooms, fetched_at=None):
+        self.rooms = rooms
+        self.fetched_at = fetched_at if fetched_at is not None else time.time()
+        self.by_dept = {}
+        self.by_name = {}
+        for room in rooms:
+            dept = room_department(room)
+            if dept:
+                self.by_dept.setdefault(dept, []).append(room)
+            for label in {room.get("id"), room.get("name")}:
+                if label:
+                    ids = self.by_name.setdefault(normalize_name(label), [])
+                    if room.get("id") not in ids:
+                        ids.append(room.get("id"))
+
+    def departments(self):
+        """Départements triés, avec leur nombre de salles."""
+        return {dept: len(self.by_dept[dept]) for dept in sorted(self.by_dept)}
+
+    def in_department(self, department):
+        """Salles d'un département ('Tous' pour toutes)."""
+        if department == "Tous":
+            return self.rooms
+        return self.by_dept.get(department, [])
+
+    def duplicates(self, rooms=None):
+        """Noms normalisés correspondant à plusieurs identifiants CELCAT.
+
+        Avec `rooms` (salles du catalogue), seuls les noms de ces salles sont
+        considérés.
+        """
+        names = None
+        if rooms is not None:
+            names = {
+                normalize_name(label)
+                for room in rooms
+                for label in (room.get("id"), room.get("name"))
+                if label
+            }
+        return {
+            name: ids
+            for name, ids in self.by_name.items()
+            if len(ids) > 1 and (names is None or name in names)
+        }
+
+    def resolve(self, name):
+        """Identifiant CELCAT exact d'une salle.
+
+        Lève KeyError si le nom est inconnu et ValueError s'il est ambigu
+        (plusieurs identifiants pour le même nom normalisé, sans
+        correspondance exacte).
+        """
+        ids = self.by_name.get(normalize_name(name))
+        if not ids:
+            raise KeyError(name)
+        if name in ids:
+            return name
+        if len(ids) > 1:
+            raise ValueError(f"nom de salle ambigu : {name!r} ({', '.join(ids)})")
+        return ids[0]
+
+    def save(self, path=CATALOG_PATH):
+        """Écrit le catalogue sur disque."""
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"fetched_at": self.fetched_at, "rooms": self.rooms}, f)
+        os.replace(tmp_path, path)
+
+
+def read_catalog(path=CATALOG_PATH):
+    """Lit le catalogue enregistré dans `path`, ou None s'il est absent ou illisible."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return RoomCatalog(data["rooms"], data["fetched_at"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def load_catalog(path=CATALOG_PATH, ttl=CATALOG_TTL, refresh=False):
+    """Charge le catalogue local, ou le récupère depuis CELCAT s'il est périmé."""
+    if not refresh:
+        catalog = read_catalog(path)
+        if catalog is not None and time.time() - catalog.fetched_at < ttl:
+            return catalog
+    catalog = RoomCatalog(get_rooms())
+    catalog.save(path)
+    return catalog
+
+
+def local_catalog(path=CATALOG_PATH):
+    """Catalogue local quel que soit son âge, sans accès réseau (None s'il manque).
+
+    Il est relu seulement quand le fichier a changé.
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    with _local_lock:
+        cached = _local.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+    catalog = read_catalog(path)
+    with _local_lock:
+        _local[path] = (mtime, catalog)
+    return catalog
+
+
+def resolve_entities(entities, catalog=None):
+    """Remplace les noms de salles des entités (type, id) par leur identifiant exact.
+
+    Retourne (entités, salles absentes du catalogue) ; les salles absentes
+    et, sans catalogue local, toutes les salles sont gardées telles
+    quelles. Lève ValueError pour un nom de salle ambigu.
+    """
+    catalog = catalog or local_catalog()
+    if catalog is None:
+        return list(entities), []
+    resolved = []
+    unknown = []
+    for entity_type, name in entities:
+        if entity_type == "room":
+            try:
+                name = catalog.resolve(name)
+            except KeyError:
+                unknown.append(name)
+        resolved.append((entity_type, name))
+    return resolved, unknown
@@ -3,17 +3,43 @@ Ce module récupère les données de calendrier depuis l'EDT UVSQ CELCAT
 et les convertit en fichiers .ics lisibles par les applications de calendrier.
 """
 
-import json
 import re
 import os
+import time
 from datetime import datetime, timezone, timedelta
-import urllib.request
-import urllib.parse
 import calendar
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from ics_utils import events_to_ics
+from transport import get_transport
+from metrics import get_metrics
+from catalog import normalize_name
+from cache import get_cache, make_key, note_served, refresh_requested, ttl_for
+
+YEAR_WORKERS = 4
 
 
 def post_calendar(start, end, res_type, cal_view, federation_ids):
+    """Récupère les données de calendrier depuis CELCAT, en passant par le cache local."""
+    store = get_cache()
+    if store is None:
+        return fetch_calendar(start, end, res_type, cal_view, federation_ids)
+    key = make_key(start, end, res_type, cal_view, federation_ids)
+    if not refresh_requested():
+        entry = store.get_entry(key)
+        if entry is not None:
+            get_metrics().inc("GetCalendarData", "cache_hits")
+            note_served(entry[1])
+            return entry[0]
+    get_metrics().inc("GetCalendarData", "cache_misses")
+    data = fetch_calendar(start, end, res_type, cal_view, federation_ids)
+    store.put(key, data, ttl_for(end))
+    note_served(time.time())
+    return data
+
+
+def fetch_calendar(start, end, res_type, cal_view, federation_ids):
     """Récupère les données de calendrier depuis l'API CELCAT."""
     data = []
     data.append(("start", start))
@@ -23,70 +49,185 @@ def post_calendar(start, end, res_type, cal_view, federation_ids):
     for fid in federation_ids:
         data.append(("federationIds[]", fid))
     headers = {
-        "User-Agent": "Mozilla/5.0",
-        "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
         "Accept": "application/json, text/javascript, */*; q=0.01",
         "X-Requested-With": "XMLHttpRequest",
         "Referer": "https://edt.uvsq.fr/",
     }
-    req = urllib.request.Request(
-        "https://edt.uvsq.fr/Home/GetCalendarData",
-        data=urllib.parse.urlencode(data).encode("utf-8"),
-        headers=headers,
-        method="POST",
+    resp = get_transport().post(
+        "/Home/GetCalendarData", data=data, headers=headers, idempotent=True
     )
-    with urllib.request.urlopen(req) as resp:
-        charset = resp.headers.get_content_charset() or "utf-8"
-        text = resp.read().decode(charset, errors="replace")
-        return json.loads(text)
+    items = resp.json()
+    if isinstance(items, list):
+        get_metrics().inc("GetCalendarData", "events", len(items))
+    return items
+
+
+_BR_RE = re.compile(r"<br\s*/?>")
+_TAG_RE = re.compile(r"<[^>]+>")
+_DIGIT_RE = re.compile(r"\d")
+_UTC = timezone.utc
 
 
 def to_utc(dt_str):
     """Convertit une chaîne de date en datetime UTC."""
-    tz = timezone.utc
     dt = datetime.fromisoformat(dt_str)
     if dt.tzinfo is None:
-        dt = dt.replace(tzinfo=tz)
-    return dt.astimezone(timezone.utc)
+        return dt.replace(tzinfo=_UTC)
+    return dt.astimezone(_UTC)
+
+
+def description_lines(desc_html):
+    """Extrait les lignes non vides de la description HTML d'un événement."""
+    desc_text = _TAG_RE.sub("", _BR_RE.sub("\n", desc_html or ""))
+    return [ln.strip() for ln in desc_text.splitlines() if ln.strip()]
+
+
+def room_from_lines(desc_lines, sites):
+    """Retrouve la salle d'un événement dans sa description, sinon dans `sites`."""
+    for ln in desc_lines:
+        if "Salle" in ln or (" - " in ln and _DIGIT_RE.search(ln)):
+            return ln
+    if sites:
+        return sites[0]
+    return ""
+
+
+class Event:
+    """Événement CELCAT compact.
+
+    La description HTML n'est analysée qu'à la première lecture de `details`
+    ou `salle`. `entities` liste les entités (groupes, salles, modules) dont
+    provient l'événement, `group` étant la première. L'objet se lit aussi
+    comme l'ancien dict (`ev["start"]`, `ev.get("salle")`, `to_dict()`).
+    """
+
+    __slots__ = (
+        "id",
+        "type",
+        "name",
+        "group",
+        "start",
+        "end",
+        "color",
+        "entities",
+        "_description",
+        "_sites",
+        "_details",
+        "_salle",
+    )
+    FIELDS = (
+        "id",
+        "type",
+        "name",
+        "group",
+        "details",
+        "salle",
+        "start",
+        "end",
+        "color",
+        "entities",
+    )
+
+    def __init__(
+        self,
+        id=None,  # pylint: disable=redefined-builtin
+        type="",  # pylint: disable=redefined-builtin
+        name="",
+        group=None,
+        start=None,
+        end=None,
+        color=None,
+        description="",
+        sites=None,
+        entities=(),
+    ):
+        self.id = id
+        self.type = type
+        self.name = name
+        self.group = group
+        self.start = start
+        self.end = end
+        self.color = color
+        self.entities = entities
+        self._description = description
+        self._sites = sites
+        self._details = None
+        self._salle = None
+
+    def _parse(self):
+        """Analyse la description HTML (une seule fois)."""
+        desc_lines = description_lines(self._description)
+        self._details = "\n".join(desc_lines)
+        self._salle = room_from_lines(desc_lines, self._sites)
+        self._description = None
+
+    @property
+    def details(self):
+        """Description en texte brut."""
+        if self._details is None:
+            self._parse()
+        return self._details
+
+    @property
+    def salle(self):
+        """Salle de l'événement."""
+        if self._salle is None:
+            self._parse()
+        return self._salle
+
+    def get(self, key, default=None):
+        """Accès façon dict."""
+        if key in self.FIELDS:
+            return getattr(self, key)
+        return default
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in self.FIELDS
+
+    def keys(self):
+        """Noms des champs, comme pour un dict."""
+        return list(self.FIELDS)
+
+    def to_dict(self):
+        """Retourne l'événement sous forme de dict."""
+        return {key: getattr(self, key) for key in self.FIELDS}
+
+    def __repr__(self):
+        return f"Event({self.to_dict()!r})"
 
 
 def calendar_json_to_events(json_list, federation_ids=None):
-    """Convertit les données JSON de CELCAT en structure d'événements."""
+    """Convertit les données JSON de CELCAT en liste d'Event."""
+    t0 = time.perf_counter()
+    group = federation_ids[0] if federation_ids else None
+    entities = tuple(federation_ids) if federation_ids else ()
     evts = []
+    append = evts.append
     for item in json_list:
-        modules = item.get("modules") or []
-        group = None
-        if federation_ids and len(federation_ids) > 0:
-            group = federation_ids[0]
-        desc_html = item.get("description") or ""
-        desc_text = re.sub(r"<br\s*/?>", "\n", desc_html)
-        desc_text = re.sub(r"<[^>]+>", "", desc_text)
-        desc_lines = [ln.strip() for ln in desc_text.splitlines() if ln.strip()]
-        salle = ""
-        for ln in desc_lines:
-            if "Salle" in ln or (" - " in ln and any(ch.isdigit() for ch in ln)):
-                salle = ln
-                break
-        if not salle:
-            sites = item.get("sites") or []
-            if sites:
-                salle = sites[0]
-        evt = {
-            "id": item.get("id"),
-            "type": item.get("eventCategory") or "",
-            "name": modules[0] if modules else "",
-            "group": group,
-            "details": "\n".join(desc_lines),
-            "salle": salle,
-            "start": to_utc(item.get("start")) if item.get("start") else None,
-            "end": to_utc(item.get("end")) if item.get("end") else None,
-            "color": (
-                item.get("backgroundColor")
-                or item.get("background")
-                or item.get("backColor")
-            ),
-        }
-        evts.append(evt)
+        get = item.get
+        modules = get("modules")
+        start = get("start")
+        end = get("end")
+        append(
+            Event(
+                get("id"),
+                get("eventCategory") or "",
+                modules[0] if modules else "",
+                group,
+                to_utc(start) if start else None,
+                to_utc(end) if end else None,
+                get("backgroundColor") or get("background") or get("backColor"),
+                get("description") or "",
+                get("sites"),
+                entities,
+            )
+        )
+    get_metrics().observe("GetCalendarData", "convert", time.perf_counter() - t0)
     return evts
 
 
@@ -117,52 +258,251 @@ def month_start_end(y, m):
     return first, last
 
 
-def fetch_year(date_str, res_type, federation_ids):
-    """Récupère les événements de l'année universitaire complète."""
+def academic_year_months(date_str):
+    """Retourne les mois (année, mois) de l'année universitaire, de septembre à août."""
     d = datetime.fromisoformat(date_str)
     start_year = d.year if d.month >= 9 else d.year - 1
     months = list(range(9, 13)) + list(range(1, 9))
-    combined = []
+    return [(start_year if m >= 9 else start_year + 1, m) for m in months]
+
+
+def fetch_month(y, m, res_type, federation_ids):
+    """Récupère un mois de calendrier.
+
+    Les erreurs passagères sont déjà retentées par le limiteur du transport
+    (voir limiter) ; une erreur qui en sort fait échouer le mois.
+    """
+    s, e = month_start_end(y, m)
+    return post_calendar(s, e, res_type, "month", federation_ids)
+
+
+def iter_year_batches(date_str, res_type, federation_ids, workers=YEAR_WORKERS):
+    """Génère les événements bruts de l'année universitaire, mois par mois.
+
+    Les mois sont récupérés en parallèle mais rendus dans l'ordre
+    chronologique, sans doublons (un événement à cheval sur deux mois est
+    gardé au premier). Au plus `workers` mois sont en cours ou en attente
+    en plus du mois rendu : la mémoire occupée est bornée par
+    (workers + 1) mois de réponses, plus l'ensemble des identifiants déjà vus.
+    """
+    months = iter(academic_year_months(date_str))
     seen = set()
-    for m in months:
-        y = start_year if m >= 9 else start_year + 1
-        s, e = month_start_end(y, m)
-        for it in post_calendar(s, e, res_type, "month", federation_ids):
-            iid = it.get("id")
-            if iid not in seen:
-                seen.add(iid)
-                combined.append(it)
-    return combined
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        pending = deque(
+            pool.submit(fetch_month, y, m, res_type, federation_ids)
+            for y, m in islice(months, max(1, workers))
+        )
+        while pending:
+            data = pending.popleft().result()
+            following = next(months, None)
+            if following is not None:
+                y, m = following
+                pending.append(pool.submit(fetch_month, y, m, res_type, federation_ids))
+            batch = []
+            for it in data:
+                iid = it.get("id")
+                if iid not in seen:
+                    seen.add(iid)
+                    batch.append(it)
+            del data
+            yield batch
 
 
-def run(period, date, entity_type, entity_arg, out_fname=None):
-    """Génère un fichier ICS depuis CELCAT pour une période donnée."""
-    period_to_view = {
-        "day": "agendaDay",
-        "week": "agendaWeek",
-        "month": "month",
-        "year": "year",
-    }
+def fetch_year(date_str, res_type, federation_ids, workers=YEAR_WORKERS):
+    """Récupère les événements bruts de l'année universitaire complète (liste)."""
+    return [
+        it
+        for batch in iter_year_batches(date_str, res_type, federation_ids, workers)
+        for it in batch
+    ]
+
+
+def iter_year_events(date_str, res_type, federation_ids, workers=YEAR_WORKERS):
+    """Génère les Event de l'année universitaire, convertis mois par mois."""
+    for batch in iter_year_batches(date_str, res_type, federation_ids, workers):
+        yield from calendar_json_to_events(batch, federation_ids)
+
+
+PERIOD_TO_VIEW = {
+    "day": "agendaDay",
+    "week": "agendaWeek",
+    "month": "month",
+    "year": "year",
+}
+RES_TYPES = {"module": 100, "room": 102, "group": 103}
+# Champ des événements bruts qui nomme directement l'entité, par resType.
+ENTITY_FIELDS = {100: "modules", 102: "sites"}
+
+
+def parse_entity(spec, default_type=None):
+    """Analyse une entité « type:identifiant » (type parmi RES_TYPES).
+
+    Sans préfixe de type reconnu, l'entité est de type `default_type`, ou
+    invalide (ValueError) si celui-ci n'est pas donné.
+    """
+    entity_type, sep, entity_id = spec.partition(":")
+    if sep and entity_type in RES_TYPES and entity_id:
+        return entity_type, entity_id
+    if default_type is None:
+        raise ValueError(f"entité invalide (type:identifiant attendu) : {spec!r}")
+    return default_type, spec
+
+
+def entity_index(ids):
+    """Index {nom normalisé: identifiants} des entités d'un lot."""
+    by_norm = {}
+    for entity_id in ids:
+        by_norm.setdefault(normalize_name(entity_id), []).append(entity_id)
+    return by_norm
+
+
+def match_event_entities(item, res_type, by_norm):
+    """Retrouve les entités d'un lot concernées par un événement CELCAT brut.
+
+    `by_norm` est l'index du lot (voir entity_index), construit une fois
+    par lot. La correspondance se fait sur le champ propre au type
+    (`modules`, `sites`) et sur les lignes de la description. Retourne None
+    si l'attribution est ambiguë (aucune entité reconnue, ou nom normalisé
+    partagé par plusieurs entités du lot).
+    """
+    field = ENTITY_FIELDS.get(res_type)
+    candidates = list(item.get(field) or []) if field else []
+    candidates += description_lines(item.get("description"))
+    matched = []
+    for cand in candidates:
+        same = by_norm.get(normalize_name(cand))
+        if same is None:
+            continue
+        if cand in same:
+            matched.append(cand)
+        elif len(same) > 1:
+            return None
+        else:
+            matched.append(same[0])
+    return list(dict.fromkeys(matched)) or None
+
+
+def per_entity_fallback(fetch, ids):
+    """Appelle `fetch` entité par entité ; une erreur remplace ses données."""
+    results = {}
+    for entity_id in ids:
+        try:
+            results[entity_id] = fetch([entity_id])
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            results[entity_id] = err
+    return results
+
+
+def fetch_by_entity(fetch, res_type, ids):
+    """Récupère un lot d'entités de même type en un appel `fetch(ids)`.
 
-    start, end = compute_range(period, date)
-    res_map = {"module": 100, "room": 102, "group": 103}
-    res_type = res_map.get(entity_type, 103)
-    federation_ids = [entity_arg]
+    Les événements bruts sont répartis par entité ; si l'appel groupé échoue
+    ou qu'un événement ne peut pas être attribué sans ambiguïté, chaque
+    entité du lot est interrogée séparément (une entité en échec reçoit
+    alors l'exception au lieu de sa liste d'événements).
+    """
+    ids = list(dict.fromkeys(ids))
+    if len(ids) == 1:
+        return {ids[0]: fetch(ids)}
+    try:
+        data = fetch(ids)
+    except Exception:  # pylint: disable=broad-exception-caught
+        return per_entity_fallback(fetch, ids)
+    per_entity = {entity_id: [] for entity_id in ids}
+    by_norm = entity_index(ids)
+    for item in data if isinstance(data, list) else []:
+        matched = match_event_entities(item, res_type, by_norm)
+        if matched is None:
+            return per_entity_fallback(fetch, ids)
+        for entity_id in matched:
+            per_entity[entity_id].append(item)
+    return per_entity
 
+
+def fetch_type_events(period, date, res_type, ids):
+    """Données brutes d'entités de même resType, réparties par entité."""
     if period == "year":
-        data = fetch_year(date, res_type, federation_ids)
+
+        def fetch(batch):
+            return fetch_year(date, res_type, batch)
+
     else:
-        data = post_calendar(
-            start,
-            end,
-            res_type,
-            period_to_view.get(period, "agendaDay"),
-            federation_ids,
+        start, end = compute_range(period, date)
+        cal_view = PERIOD_TO_VIEW.get(period, "agendaDay")
+
+        def fetch(batch):
+            return post_calendar(start, end, res_type, cal_view, batch)
+
+    return fetch_by_entity(fetch, res_type, ids)
+
+
+def fetch_entities_events(period, date, entities):
+    """Récupère et fusionne les événements de plusieurs entités de types mélangés.
+
+    `entities` est une liste de (type, identifiant). Les identifiants sont
+    regroupés par resType (un appel groupé par type, les types en
+    parallèle), puis les événements sont dédoublonnés par identifiant
+    CELCAT ; chacun garde dans `entities` la liste de ses entités.
+    """
+    by_type = {}
+    for entity_type, entity_id in entities:
+        by_type.setdefault(RES_TYPES.get(entity_type, 103), []).append(entity_id)
+    with ThreadPoolExecutor(max_workers=max(1, len(by_type))) as pool:
+        results = list(
+            pool.map(
+                lambda rt: fetch_type_events(period, date, rt, by_type[rt]), by_type
+            )
         )
+    items = {}
+    tags = {}
+    for per_entity in results:
+        for entity_id, data in per_entity.items():
+            if isinstance(data, Exception):
+                raise data
+            for item in data:
+                key = item.get("id") or id(item)
+                if key not in items:
+                    items[key] = item
+                    tags[key] = []
+                if entity_id not in tags[key]:
+                    tags[key].append(entity_id)
+    events = calendar_json_to_events(list(items.values()))
+    for key, ev in zip(items, events):
+        ev.entities = tuple(tags[key])
+        ev.group = ev.entities[0]
+    return events
+
+
+def fetch_events(period, date, entity_type, entity_arg):
+    """Récupère et convertit les événements d'une entité pour une période donnée."""
+    return fetch_entities_events(period, date, [(entity_type, entity_arg)])
+
+
+def stream_events(period, date, entities):
+    """Événements de `entities` sous forme d'itérable, en flux si possible.
+
+    L'export annuel d'une seule entité est un générateur (voir
+    iter_year_batches) à écrire directement avec events_to_ics ; les autres
+    cas renvoient la liste de fetch_entities_events.
+    """
+    if period == "year" and len(entities) == 1:
+        entity_type, entity_id = entities[0]
+        return iter_year_events(date, RES_TYPES.get(entity_type, 103), [entity_id])
+    return fetch_entities_events(period, date, entities)
+
+
+def run(period, date, entity_type, entity_arg, out_fname=None):
+    """Génère un fichier ICS depuis CELCAT pour une période donnée.
 
+    `entity_arg` est un identifiant de type `entity_type`, ou une liste
+    d'entités (identifiants ou « type:identifiant ») fusionnées dans un
+    seul calendrier.
+    """
+    args = [entity_arg] if isinstance(entity_arg, str) else list(entity_arg)
+    entities = [parse_entity(arg, entity_type) for arg in args]
     if not out_fname:
-        out_fname = f"{entity_arg}-{period}_{date}.ics"
-    events_to_ics(
-        calendar_json_to_events(data, federation_ids),
+        out_fname = f"{'+'.join(e[1] for e in entities)}-{period}_{date}.ics"
+    return events_to_ics(
+        stream_events(period, date, entities),
         out_path=os.path.join("calendars", out_fname),
     )
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""Faux serveur CELCAT local pour les benchmarks et les essais hors ligne.
+
+Il répond à /Home/GetCalendarData et /Home/ReadResourceListItems avec des
+données synthétiques (ou enregistrées) et une latence configurable.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import threading
+import time
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class FakeCelcat(ThreadingHTTPServer):
+    """Serveur CELCAT synthétique.
+
+    - `latency` : délai ajouté à chaque réponse (secondes) ;
+    - `events_per_day` : événements générés par entité et par jour ouvré ;
+    - `padding` : octets ajoutés à chaque description (taille des réponses) ;
+    - `rooms` : nombre de salles renvoyées par ReadResourceListItems ;
+    - `months` : mois (1 à 12) qui ont des événements (défaut : tous) ;
+    - `recorded` : réponse GetCalendarData enregistrée à renvoyer telle quelle.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address=("127.0.0.1", 0),
+        latency=0.0,
+        events_per_day=4,
+        padding=0,
+        rooms=100,
+        months=None,
+        recorded=None,
+    ):
+        super().__init__(address, FakeCelcatHandler)
+        self.latency = latency
+        self.events_per_day = events_per_day
+        self.padding = padding
+        self.rooms = rooms
+        self.months = months
+        self.recorded = recorded
+        self.requests = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        """URL de base à donner au transport."""
+        return f"http://{self.server_address[0]}:{self.server_port}"
+
+    def count(self, size):
+        """Comptabilise une réponse envoyée."""
+        with self._lock:
+            self.requests += 1
+            self.bytes_sent += size
+
+    def reset_counters(self):
+        """Remet les compteurs à zéro."""
+        with self._lock:
+            self.requests = 0
+            self.bytes_sent = 0
+
+    def room_name(self, i):
+        """Nom de la i-ème salle synthétique."""
+        return f"{100 + i} - BATIMENT {chr(65 + i % 26)}"
+
+    def calendar(self, start, end, federation_ids):
+        """Événements synthétiques de chaque entité, jour par jour."""
+        if self.recorded is not None:
+            return self.recorded
+        d0 = date.fromisoformat(start[:10])
+        d1 = max(date.fromisoformat(end[:10]), d0 + timedelta(days=1))
+        items = []
+        pad = "x" * self.padding
+        for fid in federation_ids:
+            seed = int(hashlib.sha1(fid.encode("utf-8")).hexdigest()[:6], 16)
+            d = d0
+            while d < d1:
+                if d.weekday() < 6 and (not self.months or d.month in self.months):
+                    for k in range(self.events_per_day):
+                        hour = 8 + (seed + k * 2 + d.toordinal()) % 10
+                        s = datetime(d.year, d.month, d.day, hour, 0)
+                        e = s + timedelta(hours=1, minutes=30)
+                        items.append(
+                            {
+                                "id": f"{seed}-{d.toordinal()}-{k}",
+                                "start": s.isoformat(),
+                                "end": e.isoformat(),
+                                "eventCategory": "CM",
+                                "modules": [f"MOD{(seed + k) % 50:03d}"],
+                                "sites": ["Versailles"],
+                                "description": f"CM<br />{fid}<br />M1<br />{pad}",
+                            }
+                        )
+                d += timedelta(days=1)
+        return items
+
+    def resources(self, page, page_size):
+        """Page de la liste des salles synthétiques."""
+        first = (page - 1) * page_size
+        results = [
+            {"id": self.room_name(i), "name": self.room_name(i), "dept": f"D{i % 5}"}
+            for i in range(first, min(first + page_size, self.rooms))
+        ]
+        return {"results": results, "total": self.rooms}
+
+
+class FakeCelcatHandler(BaseHTTPRequestHandler):
+    """Gestionnaire des deux routes CELCAT simulées."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """GetCalendarData."""
+        length = int(self.headers.get("Content-Length") or 0)
+        form = parse_qs(self.rfile.read(length).decode("utf-8"))
+        if urlsplit(self.path).path != "/Home/GetCalendarData":
+            self.send_error(404)
+            return
+        data = self.server.calendar(
+            form.get("start", [""])[0],
+            form.get("end", [""])[0],
+            form.get("federationIds[]", []),
+        )
+        self.send_json(data)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """ReadResourceListItems."""
+        url = urlsplit(self.path)
+        if url.path != "/Home/ReadResourceListItems":
+            self.send_error(404)
+            return
+        params = parse_qs(url.query)
+        page = int(params.get("pageNumber", ["1"])[0])
+        page_size = int(params.get("pageSize", ["500"])[0])
+        self.send_json(self.server.resources(page, page_size))
+
+    def send_json(self, data):
+        """Envoie une réponse JSON (gzippée si le client l'accepte)."""
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(200)
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body, compresslevel=1)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.count(len(body))
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """Pas de journal par requête."""
+
+
+def start(**options):
+    """Démarre un faux serveur dans un thread et le retourne."""
+    server = FakeCelcat(**options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    """Lance le faux serveur au premier plan."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--events-per-day", type=int, default=4)
+    parser.add_argument("--padding", type=int, default=0)
+    parser.add_argument("--rooms", type=int, default=100)
+    parser.add_argument("--recorded", help="réponse GetCalendarData enregistrée (JSON)")
+    args = parser.parse_args(argv)
+    recorded = None
+    if args.recorded:
+        with open(args.recorded, "r", encoding="utf-8") as f:
+            recorded = json.load(f)
+    server = FakeCelcat(
+        ("127.0.0.1", args.port),
+        latency=args.latency,
+        events_per_day=args.events_per_day,
+        padding=args.padding,
+        rooms=args.rooms,
+        recorded=recorded,
+    )
+    print(f"Faux CELCAT sur {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
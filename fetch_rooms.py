@@ -1,42 +1,95 @@
 """Module pour récupérer et écrire les salles depuis l'API CELCAT."""
 
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict
-import requests
+from transport import get_transport
+from metrics import get_metrics
 
+PAGE_SIZE = 500
+PAGE_WORKERS = 4
+MAX_PAGES = 200
 
-def get_rooms():
-    """Récupère la liste des salles disponibles depuis l'API CELCAT."""
-    session = requests.Session()
-    url = "https://edt.uvsq.fr/Home/ReadResourceListItems"
+
+def get_rooms_page(page_number, page_size=PAGE_SIZE):
+    """Récupère une page de la liste des salles ; retourne (salles, total ou None)."""
     params = {
         "myResources": "false",
         "searchTerm": "-",
-        "pageSize": "500",
-        "pageNumber": "1",
+        "pageSize": str(page_size),
+        "pageNumber": str(page_number),
         "resType": "102",
         "secondaryFilterValue1": "",
         "secondaryFilterValue2": "",
     }
     headers = {
-        "User-Agent": "Mozilla/5.0",
         "Accept": "*/*",
         "X-Requested-With": "XMLHttpRequest",
         "Referer": "https://edt.uvsq.fr",
     }
 
-    resp = session.get(url, params=params, headers=headers, timeout=15)
-    resp.raise_for_status()
+    resp = get_transport().get(
+        "/Home/ReadResourceListItems", params=params, headers=headers
+    )
     data = resp.json()
     results: List[Dict] = []
-    for key in ("items", "rows", "data", "results"):
-        if key in data and isinstance(data[key], list):
-            data_list = data[key]
-            break
+    data_list = data if isinstance(data, list) else []
+    total = None
+    if isinstance(data, dict):
+        for key in ("items", "rows", "data", "results"):
+            if key in data and isinstance(data[key], list):
+                data_list = data[key]
+                break
+        for key in ("total", "totalCount", "count"):
+            if isinstance(data.get(key), int):
+                total = data[key]
+                break
+    get_metrics().inc("ReadResourceListItems", "rooms", len(data_list))
     for item in data_list:
         item_id = item.get("id")
         name = item.get("name")
         results.append({"id": item_id, "name": name or str(item), "raw": item})
-    return results
+    return results, total
+
+
+def get_rooms(page_size=PAGE_SIZE, workers=PAGE_WORKERS, max_pages=MAX_PAGES):
+    """Récupère la liste complète des salles depuis l'API CELCAT (toutes les pages).
+
+    Si CELCAT annonce le total, les pages restantes sont récupérées en
+    parallèle ; sinon elles le sont par vagues de `workers` pages jusqu'à
+    la première page incomplète, ou sans salle nouvelle (serveur qui ignore
+    pageNumber), et au plus `max_pages` pages.
+    """
+    rooms, total = get_rooms_page(1, page_size)
+    if len(rooms) < page_size:
+        return rooms
+    seen = {(room["id"], room["name"]) for room in rooms}
+
+    def add_new(page_rooms):
+        """Ajoute les salles pas encore vues ; retourne leur nombre."""
+        new = [r for r in page_rooms if (r["id"], r["name"]) not in seen]
+        seen.update((r["id"], r["name"]) for r in new)
+        rooms.extend(new)
+        return len(new)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        if total is not None:
+            pages = range(2, min(-(-total // page_size), max_pages) + 1)
+            for page_rooms, _ in pool.map(
+                lambda p: get_rooms_page(p, page_size), pages
+            ):
+                add_new(page_rooms)
+            return rooms
+        page = 2
+        while page <= max_pages:
+            wave = range(page, min(page + workers, max_pages + 1))
+            done = False
+            for page_rooms, _ in pool.map(lambda p: get_rooms_page(p, page_size), wave):
+                if not done:
+                    done = not add_new(page_rooms) or len(page_rooms) < page_size
+            if done:
+                break
+            page += workers
+    return rooms
 
 
 def write_rooms_cfg(rooms, out_path):
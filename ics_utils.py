@@ -1,48 +1,214 @@
 """Module utilitaire pour générer des fichiers ICS."""
 
 from io import BytesIO
-import uuid
+import filecmp
+import gzip
+import hashlib
 from datetime import datetime, timezone
 import os
 
+FOLD_LIMIT = 75
+GZIP_MAGIC = b"\x1f\x8b"
+
 
 def fmt(dt):
     """Formate un datetime au format ICS."""
     return dt.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
 
 
-def events_to_ics(events, out_path=None):
-    """Convertit une liste d'événements en fichier ICS."""
-    if out_path is None:
-        out_path = os.path.join("calendars", "calendar.ics")
-    buf = BytesIO()
+def event_summary(e):
+    """Construit le titre (SUMMARY) d'un événement."""
+    summary = e.get("type", "")
+    if e.get("name"):
+        summary = summary + " - " + e.get("name") if summary else e.get("name")
+    return summary
+
+
+def event_hash(e):
+    """Calcule l'empreinte du contenu publié d'un événement (CATEGORIES compris)."""
+    parts = [
+        fmt(e["start"]) if e.get("start") else "",
+        fmt(e["end"]) if e.get("end") else "",
+        e.get("salle", "") or "",
+        e.get("details") or "",
+        event_summary(e),
+    ]
+    if e.get("entities"):
+        parts.append(",".join(e["entities"]))
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def event_uid(e, content_hash):
+    """UID stable d'un événement, dérivé de son identifiant CELCAT."""
+    if e.get("id"):
+        return f"celcat-{e['id']}@uvsq"
+    return f"celcat-{content_hash}@uvsq"
+
+
+def unfold(lines):
+    """Déplie les lignes de contenu d'un calendrier (RFC 5545 §3.1)."""
+    current = None
+    for raw in lines:
+        raw = raw.rstrip("\r\n")
+        if raw[:1] in (" ", "\t") and current is not None:
+            current += raw[1:]
+            continue
+        if current is not None:
+            yield current
+        current = raw
+    if current is not None:
+        yield current
+
+
+def ics_state(lines):
+    """Extrait {UID: (empreinte, DTSTAMP, SEQUENCE)} des lignes d'un calendrier."""
+    state = {}
+    current = None
+    for line in unfold(lines):
+        if line == "BEGIN:VEVENT":
+            current = {}
+        elif line == "END:VEVENT" and current is not None:
+            if "UID" in current:
+                state[current["UID"]] = (
+                    current.get("X-CELCAT-HASH"),
+                    current.get("DTSTAMP"),
+                    int(current.get("SEQUENCE") or 0),
+                )
+            current = None
+        elif current is not None and ":" in line:
+            name, value = line.split(":", 1)
+            current[name.split(";", 1)[0]] = value
+    return state
+
+
+def read_ics_state(path):
+    """Lit un .ics existant et retourne {UID: (empreinte, DTSTAMP, SEQUENCE)}.
+
+    Un fichier gzippé est reconnu à ses octets magiques, quel que soit son nom.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, "rb") as f:
+        compressed = f.read(2) == GZIP_MAGIC
+    opener = gzip.open if compressed else open
+    with opener(path, "rt", encoding="utf-8", errors="replace") as f:
+        return ics_state(f)
+
 
-    buf.write("BEGIN:VCALENDAR\n".encode("utf-8"))
-    buf.write("VERSION:2.0\n".encode("utf-8"))
-    buf.write("PRODID:-//UVSQ-celcat//EN\n".encode("utf-8"))
+def escape_text(value):
+    """Échappe une valeur TEXT (RFC 5545 §3.3.11)."""
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def fold_line(line):
+    """Encode une ligne de contenu et la plie à 75 octets (RFC 5545 §3.1)."""
+    data = line.encode("utf-8")
+    if len(data) <= FOLD_LIMIT:
+        return data + b"\r\n"
+    parts = []
+    start = 0
+    limit = FOLD_LIMIT
+    while start < len(data):
+        end = min(start + limit, len(data))
+        while end < len(data) and (data[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(data[start:end])
+        start = end
+        limit = FOLD_LIMIT - 1
+    return b"\r\n ".join(parts) + b"\r\n"
+
+
+def event_lines(e, previous, now):
+    """Produit les lignes de contenu d'un VEVENT."""
+    content_hash = event_hash(e)
+    uid = event_uid(e, content_hash)
+    old_hash, old_stamp, old_seq = previous.get(uid, (None, None, None))
+    if old_hash == content_hash and old_stamp:
+        dtstamp, sequence = old_stamp, old_seq
+    else:
+        dtstamp = now
+        sequence = 0 if old_seq is None else old_seq + 1
+    yield "BEGIN:VEVENT"
+    yield f"UID:{uid}"
+    yield f"DTSTAMP:{dtstamp}"
+    yield f"SEQUENCE:{sequence}"
+    if e.get("start"):
+        yield f"DTSTART:{fmt(e['start'])}"
+    if e.get("end"):
+        yield f"DTEND:{fmt(e['end'])}"
+    yield f"LOCATION:{escape_text(e.get('salle', '') or '')}"
+    yield f"DESCRIPTION:{escape_text(e.get('details') or '')}"
+    yield f"SUMMARY:{escape_text(event_summary(e))}"
+    if e.get("entities"):
+        yield f"CATEGORIES:{','.join(escape_text(x) for x in e['entities'])}"
+    yield f"X-CELCAT-HASH:{content_hash}"
+    yield "TRANSP:OPAQUE"
+    yield "END:VEVENT"
+
+
+def write_ics(events, fh, previous=None, compress=False):
+    """Écrit un calendrier ICS en flux dans `fh` et retourne le nombre d'octets.
+
+    `events` peut être n'importe quel itérable (générateur compris) : un seul
+    événement est en mémoire à la fois. `previous` est l'état d'un .ics
+    existant (voir read_ics_state). Avec `compress`, la sortie est gzippée
+    (sans horodatage ni nom de fichier, pour rester reproductible).
+    """
+    if compress:
+        with gzip.GzipFile(filename="", fileobj=fh, mode="wb", mtime=0) as gz:
+            write_ics(events, gz, previous)
+        return fh.tell() if fh.seekable() else None
+    previous = previous or {}
+    now = fmt(datetime.now(timezone.utc))
+    written = 0
+    for line in ("BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//UVSQ-celcat//EN"):
+        written += fh.write(fold_line(line))
     for e in events:
-        uid = f"{fmt(datetime.now(timezone.utc))}-{uuid.uuid4()}@uvsq"
-        buf.write("BEGIN:VEVENT\n".encode("utf-8"))
-        buf.write((f"UID:{uid}\n").encode("utf-8"))
-        buf.write((f"DTSTAMP:{fmt(datetime.now(timezone.utc))}\n").encode("utf-8"))
-        if e.get("start"):
-            buf.write((f"DTSTART:{fmt(e['start'])}\n").encode("utf-8"))
-        if e.get("end"):
-            buf.write((f"DTEND:{fmt(e['end'])}\n").encode("utf-8"))
-        buf.write((f"LOCATION:{e.get('salle', '')}\n").encode("utf-8"))
-        desc = (e.get("details") or "").replace("\n", "\\n")
-        buf.write((f"DESCRIPTION:{desc}\n").encode("utf-8"))
-        summary = e.get("type", "")
-        if e.get("name"):
-            summary = summary + " - " + e.get("name") if summary else e.get("name")
-        buf.write((f"SUMMARY:{summary}\n").encode("utf-8"))
-        buf.write("TRANSP:OPAQUE\n".encode("utf-8"))
-        buf.write("END:VEVENT\n".encode("utf-8"))
-    buf.write("END:VCALENDAR".encode("utf-8"))
-    data = buf.getvalue()
+        lines = event_lines(e, previous, now)
+        written += fh.write(b"".join(fold_line(ln) for ln in lines))
+    written += fh.write(fold_line("END:VCALENDAR"))
+    return written
+
+
+def ics_bytes(events, previous=None, compress=False):
+    """Retourne le calendrier ICS complet en mémoire."""
+    buf = BytesIO()
+    write_ics(events, buf, previous, compress)
+    return buf.getvalue()
+
+
+def events_to_ics(events, out_path=None, compress=False):
+    """Écrit des événements dans un fichier ICS et retourne son chemin.
+
+    Le fichier est écrit en flux dans un fichier temporaire voisin, supprimé
+    si l'écriture échoue. Les UID sont dérivés des identifiants CELCAT : si
+    un .ics existe déjà, les événements inchangés gardent leur DTSTAMP et
+    leur SEQUENCE, et le fichier n'est pas remplacé si son contenu est
+    identique.
+    """
+    if out_path is None:
+        out_path = os.path.join("calendars", "calendar.ics")
     parent = os.path.dirname(out_path)
     if parent:
         os.makedirs(parent, exist_ok=True)
-    with open(out_path, "wb") as f:
-        f.write(data)
-    return data
+    previous = read_ics_state(out_path)
+    tmp_path = out_path + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            write_ics(events, f, previous, compress)
+        if os.path.exists(out_path) and filecmp.cmp(tmp_path, out_path, shallow=False):
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, out_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return out_path
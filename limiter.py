@@ -0,0 +1,163 @@
+"""Module de contrôle de débit des appels à CELCAT.
+
+Toutes les requêtes passent par un limiteur partagé qui combine :
+- un seau à jetons (débit moyen `rate` req/s, rafale de `burst` requêtes) ;
+- une limite de concurrence adaptative AIMD : +1/limite à chaque succès,
+  ×`backoff` sur 429/5xx/timeout (au plus une baisse par `cooldown` s) ;
+- des nouvelles tentatives à délai exponentiel avec gigue (« full jitter »)
+  pour les requêtes idempotentes.
+"""
+
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_RATE = 20.0
+DEFAULT_BURST = 10
+INITIAL_LIMIT = 4
+MIN_LIMIT = 1
+MAX_LIMIT = 16
+BACKOFF = 0.5
+COOLDOWN = 1.0
+MAX_RETRIES = 3
+RETRY_BASE = 0.5
+RETRY_CAP = 10.0
+
+_instance = None
+_instance_lock = threading.Lock()
+_options = {}
+
+
+class AdaptiveLimiter:
+    """Seau à jetons + limite de concurrence AIMD, partagés entre threads."""
+
+    def __init__(
+        self,
+        rate=DEFAULT_RATE,
+        burst=DEFAULT_BURST,
+        initial_limit=INITIAL_LIMIT,
+        min_limit=MIN_LIMIT,
+        max_limit=MAX_LIMIT,
+        backoff=BACKOFF,
+        cooldown=COOLDOWN,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.cooldown = cooldown
+        self.limit = float(initial_limit)
+        self.inflight = 0
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def _take_token(self):
+        """Attend qu'un jeton soit disponible puis le consomme."""
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._last) * self.rate
+                )
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def acquire(self):
+        """Réserve une place (débit puis concurrence)."""
+        self._take_token()
+        with self._cond:
+            while self.inflight >= int(self.limit):
+                self._cond.wait()
+            self.inflight += 1
+
+    def release(self, congested=False):
+        """Libère une place et ajuste la limite selon le résultat."""
+        with self._cond:
+            self.inflight -= 1
+            if congested:
+                now = time.monotonic()
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.min_limit, self.limit * self.backoff)
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self):
+        """Contexte d'une requête ; une erreur de surcharge réduit la limite."""
+        self.acquire()
+        congested = False
+        try:
+            yield
+        except Exception as err:
+            congested = is_congestion(err)
+            raise
+        finally:
+            self.release(congested)
+
+
+def is_congestion(err):
+    """Indique si une erreur signale une surcharge (429, 5xx, timeout)."""
+    status = getattr(err, "status", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return isinstance(err, (TimeoutError, ConnectionError))
+
+
+def is_retryable(err):
+    """Indique si une requête idempotente peut être retentée après `err`."""
+    status = getattr(err, "status", None)
+    if status is not None:
+        return status in (408, 425, 429) or status >= 500
+    return isinstance(err, OSError)
+
+
+def retry_delay(attempt, err=None, base=RETRY_BASE, cap=RETRY_CAP):
+    """Délai avant la tentative suivante (Retry-After, sinon full jitter)."""
+    retry_after = getattr(err, "retry_after", None)
+    if retry_after is not None:
+        return min(cap, retry_after)
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+def call(fn, idempotent=True, max_retries=MAX_RETRIES, on_retry=None):
+    """Appelle `fn` sous le limiteur partagé, en la retentant si possible."""
+    limiter = get_limiter()
+    attempt = 0
+    while True:
+        try:
+            with limiter.slot():
+                return fn()
+        except Exception as err:
+            if not idempotent or attempt >= max_retries or not is_retryable(err):
+                raise
+            if on_retry is not None:
+                on_retry(err)
+            time.sleep(retry_delay(attempt, err))
+            attempt += 1
+
+
+def configure(**options):
+    """Modifie les options du limiteur partagé (rate, burst, max_limit...)."""
+    global _instance  # pylint: disable=global-statement
+    with _instance_lock:
+        _options.update(options)
+        _instance = None
+
+
+def get_limiter():
+    """Retourne le limiteur partagé par toutes les requêtes."""
+    global _instance  # pylint: disable=global-statement
+    with _instance_lock:
+        if _instance is None:
+            _instance = AdaptiveLimiter(**_options)
+        return _instance
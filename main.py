@@ -1,13 +1,16 @@
 #!/usr/bin/env python3
 """Module principal pour choisir un script."""
 
+import argparse
+import atexit
 import os
 import platform
 import sys
-from datetime import datetime
-from celcat2ics import run
-from room_availability import pre_process, print_availability
-from fetch_rooms import get_rooms, write_rooms_cfg
+import time
+from datetime import datetime, timedelta
+
+# Les sous-systèmes (HTTP, cache SQLite, NumPy...) sont importés dans les
+# fonctions qui les utilisent, pour que le démarrage reste rapide.
 
 # Platform-specific imports
 if platform.system() == "Windows":
@@ -74,11 +77,11 @@ def cl_input(prompt):
     return input(prompt)
 
 
-def verify_date(date_str):
-    """Vérifie la validité d'une date (format et pas un dimanche)."""
+def verify_date(date_str, allow_sunday=False):
+    """Vérifie une date (format, et pas un dimanche sauf `allow_sunday`)."""
     try:
         date_obj = datetime.fromisoformat(date_str)
-        if date_obj.weekday() == 6:
+        if date_obj.weekday() == 6 and not allow_sunday:
             print("Le campus est fermé le dimanche.")
             sys.exit(1)
         return date_obj
@@ -100,6 +103,19 @@ def verify_time(time_str):
         sys.exit(1)
 
 
+def verify_duration(duration_str):
+    """Vérifie la validité d'une durée en minutes."""
+    try:
+        duration = int(duration_str)
+    except ValueError:
+        print("Durée invalide (nombre de minutes).")
+        sys.exit(1)
+    if duration < 0:
+        print("Durée invalide (nombre de minutes).")
+        sys.exit(1)
+    return duration
+
+
 def generate_ics():
     """Interface interactive pour générer un fichier .ics."""
     period = select_menu("Période ", ["day", "week", "month", "year"])
@@ -121,12 +137,39 @@ def generate_ics():
         or default_cal_name
     )
 
+    from celcat2ics import run  # pylint: disable=import-outside-toplevel
+
+    entities = resolve_rooms([(etype, earg)])
+    run(period, date, etype, entity_specs(entities), out_fname=ics_filename(cal_name))
+    clear()
+    sys.exit(0)
+
+
+def resolve_rooms(entities):
+    """Résout les salles d'entités (type, identifiant) avec le catalogue local."""
+    from catalog import resolve_entities  # pylint: disable=import-outside-toplevel
+
+    try:
+        entities, unknown = resolve_entities(entities)
+    except ValueError as err:
+        print(err)
+        sys.exit(1)
+    for name in unknown:
+        print(f"Salle absente du catalogue local : {name!r}")
+    return entities
+
+
+def entity_specs(entities):
+    """Entités (type, identifiant) au format « type:identifiant »."""
+    return [f"{entity_type}:{entity_id}" for entity_type, entity_id in entities]
+
+
+def ics_filename(cal_name):
+    """Nom de fichier .ics (dans calendars/) à partir d'un nom de calendrier."""
     base = os.path.basename(cal_name)
     if not base.lower().endswith(".ics"):
         base += ".ics"
-    run(period, date, etype, earg, out_fname=base)
-    clear()
-    sys.exit(0)
+    return base
 
 
 def generate_config_filename(department):
@@ -141,75 +184,70 @@ def generate_config_filename(department):
     return f"rooms_{str_dept}.txt"
 
 
-def get_room_department(room):
-    """Extrait le département d'une room."""
-    dept = None
-    if isinstance(room, dict):
-        raw = room.get("raw")
-        if isinstance(raw, dict):
-            dept = raw.get("dept")
-        if not dept:
-            dept = room.get("dept")
-    return dept
-
-
-def filter_rooms_by_department(rooms, department):
-    """Filtre les rooms par département. Si 'Tous', retourne toutes les rooms."""
-    if department == "Tous":
-        return rooms
-    filtered = []
-    for r in rooms:
-        dept = get_room_department(r)
-        if dept and str(dept).strip() == department:
-            filtered.append(r)
-    return filtered
-
-
 def generate_cfg():
     """Interface interactive pour générer un fichier de configuration de salles."""
-    rooms = get_rooms()
-    depts = {}
-    for r in rooms:
-        dept = get_room_department(r)
-        if dept:
-            d = str(dept).strip()
-            depts[d] = depts.get(d, 0) + 1
+    from cache import refresh_requested  # pylint: disable=import-outside-toplevel
+    from catalog import load_catalog  # pylint: disable=import-outside-toplevel
+
+    catalog = load_catalog(refresh=refresh_requested())
+    depts = catalog.departments()
     dept_options = ["Tous"]
     display_to_dept = {}
-    if depts:
-        for k in sorted(depts.keys()):
-            display = f"{k} ({depts[k]})"
-            dept_options.append(display)
-            display_to_dept[display] = k
+    for k, count in depts.items():
+        display = f"{k} ({count})"
+        dept_options.append(display)
+        display_to_dept[display] = k
     chosen_display = select_menu("Choisir un département (ou Tous)", dept_options)
     if chosen_display == "Tous":
         chosen_dept = "Tous"
     else:
         chosen_dept = display_to_dept.get(chosen_display, chosen_display)
-    cfg_dir = "configs"
-    os.makedirs(cfg_dir, exist_ok=True)
     default_name = generate_config_filename(chosen_dept)
     name = cl_input(f"Nom du fichier [{default_name}] : ").strip() or default_name
-    out_path = os.path.join(cfg_dir, name)
-    write_rooms_cfg(filter_rooms_by_department(rooms, chosen_dept), out_path)
+    export_cfg(catalog, chosen_dept, name)
     clear()
     sys.exit(0)
 
 
+def export_cfg(catalog, department, name):
+    """Écrit dans configs/ le fichier de config des salles d'un département."""
+    from fetch_rooms import write_rooms_cfg  # pylint: disable=import-outside-toplevel
+
+    cfg_dir = "configs"
+    os.makedirs(cfg_dir, exist_ok=True)
+    out_path = os.path.join(cfg_dir, name)
+    rooms = catalog.in_department(department)
+    for room_name, ids in catalog.duplicates(rooms).items():
+        print(f"Nom de salle en double ({room_name}) : {', '.join(ids)}")
+    write_rooms_cfg(rooms, out_path)
+    return out_path
+
+
 def rooms_availability(mode):
     """Interface interactive pour afficher la disponibilité des salles."""
     today = datetime.now().date().isoformat()
     date_input = cl_input(f"Date [{today}] : ").strip()
     date = date_input or today
     verify_date(date)
+    time = None
+    min_duration = 0
     if mode == 1:
         time_input = cl_input(
             f"Heure [{datetime.now().time().strftime('%H:%M')}] : "
         ).strip()
         time = time_input or datetime.now().time().strftime("%H:%M")
         verify_time(time)
+        duration_input = cl_input("Durée minimale en minutes [0] : ").strip()
+        min_duration = verify_duration(duration_input or "0")
+    cfg_path = choose_config()
+    clear()
+    show_availability(date, cfg_path, mode, time, min_duration)
+    sys.exit(0)
+
+
+def choose_config():
+    """Fait choisir un fichier de configuration de configs/ et retourne son chemin."""
     cfg_dir = "configs"
-    rooms = []
     cfg_files = [
         f for f in os.listdir(cfg_dir) if os.path.isfile(os.path.join(cfg_dir, f))
     ]
@@ -221,18 +259,114 @@ def rooms_availability(mode):
     if not os.path.exists(cfg_path):
         print(f"Le fichier '{choice}' n'existe pas.")
         sys.exit(1)
-    (rooms, max_len) = pre_process(cfg_path)
-    if rooms == 0:
-        print(f"La config '{choice}' est vide ou invalide.")
+    return cfg_path
+
+
+def verify_window(window_str):
+    """Vérifie une fenêtre horaire HH:MM-HH:MM et retourne (début, fin)."""
+    start, sep, end = window_str.partition("-")
+    if not sep:
+        print("Fenêtre horaire invalide (HH:MM-HH:MM).")
+        sys.exit(1)
+    if verify_time(start.strip()) >= verify_time(end.strip()):
+        print("La fenêtre horaire doit finir après son début.")
         sys.exit(1)
+    return start.strip(), end.strip()
+
+
+def search_end(first):
+    """Fin par défaut d'une recherche : six jours après `first`, sans dimanche."""
+    last = datetime.fromisoformat(first).date() + timedelta(days=6)
+    if last.weekday() == 6:
+        last -= timedelta(days=1)
+    return last.isoformat()
+
+
+def search_slots():
+    """Interface interactive pour chercher un créneau libre sur plusieurs jours."""
+    today = datetime.now().date()
+    first = cl_input(f"Du [{today}] : ").strip() or today.isoformat()
+    verify_date(first)
+    default_last = search_end(first)
+    last = cl_input(f"Au [{default_last}] : ").strip() or default_last
+    verify_date(last)
+    duration_input = cl_input("Durée minimale en minutes [120] : ").strip()
+    min_duration = verify_duration(duration_input or "120")
+    window_input = cl_input("Fenêtre horaire [08:00-18:40] : ").strip()
+    window = verify_window(window_input or "08:00-18:40")
+    cfg_path = choose_config()
     clear()
-    if mode == 1:
-        print_availability(date, cfg_path, max_len, mode, time=time)
-    else:
-        print_availability(date, cfg_path, max_len, mode)
+    show_free_slots(first, last, cfg_path, min_duration, window)
     sys.exit(0)
 
 
+def open_config(cfg_path):
+    """Charge une config de salles, signale ses salles non résolues et la retourne."""
+    from room_config import load_config  # pylint: disable=import-outside-toplevel
+
+    config = load_config(cfg_path)
+    if not config.rooms:
+        print(f"La config '{config.name}' est vide ou invalide.")
+        sys.exit(1)
+    for warning in config.warnings:
+        print(f"{config.name} : {warning}")
+    return config
+
+
+def show_free_slots(first, last, cfg_path, min_duration, window):
+    """Affiche les salles d'une config classées par créneaux libres sur une plage."""
+    import cache  # pylint: disable=import-outside-toplevel
+    from occupancy import print_free_slots  # pylint: disable=import-outside-toplevel
+
+    if datetime.fromisoformat(last) < datetime.fromisoformat(first):
+        print("La date de fin doit suivre la date de début.")
+        sys.exit(1)
+    config = open_config(cfg_path)
+    cache.reset_freshness()
+    print_free_slots(
+        first, last, config.unique_rooms, config.max_len, min_duration, window
+    )
+    report_freshness(cache.oldest_served())
+
+
+def show_availability(date, cfg_path, mode, time=None, min_duration=0):
+    """Affiche la disponibilité des salles d'une config selon le mode.
+
+    Modes : 0 matin/après-midi, 1 à une heure donnée, 2 carte hebdomadaire.
+    """
+    import cache  # pylint: disable=import-outside-toplevel
+
+    config = open_config(cfg_path)
+    cache.reset_freshness()
+    if mode == 2:
+        from occupancy_matrix import print_week_heatmap  # pylint: disable=import-outside-toplevel
+
+        print_week_heatmap(date, config)
+    elif mode == 1 and min_duration > 0:
+        from occupancy import print_free_rooms  # pylint: disable=import-outside-toplevel
+
+        print_free_rooms(date, config.unique_rooms, config.max_len, time, min_duration)
+    else:
+        from room_availability import print_availability  # pylint: disable=import-outside-toplevel
+
+        print_availability(date, config, mode, time=time if mode == 1 else None)
+    report_freshness(cache.oldest_served())
+
+
+def report_freshness(stored):
+    """Affiche l'âge des données utilisées (cache ou préchargement)."""
+    if stored is None:
+        return
+    age = int(time.time() - stored) // 60
+    if age < 1:
+        print("Données CELCAT à jour.")
+    else:
+        print(
+            f"Données CELCAT du {datetime.fromtimestamp(stored):%d/%m à %H:%M} "
+            f"(il y a {age} min ; --refresh pour mettre à jour)."
+        )
+
+
 def interactive_menu():
     """Menu principal."""
     options = [
@@ -240,6 +374,8 @@ def interactive_menu():
         "Générer un fichier de config",
         "Disponibilité des salles (matin/après-midi)",
         "Trouver une salle libre",
+        "Carte hebdomadaire des salles",
+        "Chercher un créneau sur plusieurs jours",
         "Quitter",
     ]
     idx = 0
@@ -264,11 +400,267 @@ def interactive_menu():
                     rooms_availability(mode=0)
                 elif choice.startswith("Trouver"):
                     rooms_availability(mode=1)
+                elif choice.startswith("Carte"):
+                    rooms_availability(mode=2)
+                elif choice.startswith("Chercher"):
+                    search_slots()
                 else:
                     break
     except KeyboardInterrupt:
         pass
 
 
+def resolve_config(name):
+    """Chemin d'un fichier de config, donné tel quel ou relatif à configs/."""
+    if os.path.isfile(name):
+        return name
+    path = os.path.join("configs", name)
+    if not os.path.isfile(path):
+        print(f"Le fichier '{name}' n'existe pas.")
+        sys.exit(1)
+    return path
+
+
+def report_metrics(stats, metrics_out):
+    """Affiche et/ou exporte les métriques des requêtes (appelée en sortie)."""
+    from metrics import get_metrics  # pylint: disable=import-outside-toplevel
+
+    if stats:
+        print(get_metrics().summary(), file=sys.stderr)
+    if metrics_out:
+        get_metrics().dump(metrics_out)
+
+
+def parse_args(argv=None):
+    """Analyse les options de la ligne de commande."""
+    today = datetime.now().date().isoformat()
+    parser = argparse.ArgumentParser(
+        description="Scripts en lien avec edt.uvsq.fr (menu interactif sans commande)"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="ne pas utiliser le cache local des calendriers",
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="ignorer le cache en lecture et le remettre à jour",
+    )
+    parser.add_argument(
+        "--upstream",
+        help="URL de base de CELCAT (défaut : $CELCAT_URL ou https://edt.uvsq.fr)",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="afficher les statistiques des requêtes CELCAT en sortie",
+    )
+    parser.add_argument(
+        "--metrics-out",
+        help="écrire les métriques en sortie (.prom : Prometheus, sinon JSON)",
+    )
+    sub = parser.add_subparsers(dest="command")
+
+    p = sub.add_parser("ics", help="générer un .ics")
+    p.add_argument(
+        "entity",
+        nargs="+",
+        help="groupe, salle ou module (plusieurs : calendrier fusionné ; "
+        "préfixe type: pour mélanger les types, ex. module:MYSEC304)",
+    )
+    p.add_argument(
+        "--type",
+        choices=["module", "room", "group"],
+        default="group",
+        help="type des entités sans préfixe (défaut : group)",
+    )
+    p.add_argument("--period", choices=["day", "week", "month", "year"], default="week")
+    p.add_argument("--date", default=today)
+    p.add_argument("-o", "--output", help="nom du calendrier (dans calendars/)")
+
+    p = sub.add_parser("config", help="générer un fichier de config de salles")
+    p.add_argument("--dept", default="Tous", help="département (défaut : Tous)")
+    p.add_argument("-o", "--output", help="nom du fichier (dans configs/)")
+
+    p = sub.add_parser("availability", help="disponibilité matin/après-midi")
+    p.add_argument("config")
+    p.add_argument("--date", default=today)
+
+    p = sub.add_parser("free", help="trouver une salle libre")
+    p.add_argument("config")
+    p.add_argument("--date", default=today)
+    p.add_argument("--time", default=datetime.now().time().strftime("%H:%M"))
+    p.add_argument("--min-duration", type=int, default=0, help="en minutes")
+
+    p = sub.add_parser("heatmap", help="carte hebdomadaire des salles")
+    p.add_argument("config")
+    p.add_argument("--date", default=today)
+
+    p = sub.add_parser("search", help="chercher un créneau libre sur plusieurs jours")
+    p.add_argument("config")
+    p.add_argument("--from", dest="first", default=today, help="premier jour")
+    p.add_argument(
+        "--to", dest="last", help="dernier jour (défaut : 6 jours après, hors dimanche)"
+    )
+    p.add_argument("--min-duration", type=int, default=120, help="en minutes")
+    p.add_argument(
+        "--window", default="08:00-18:40", help="fenêtre horaire HH:MM-HH:MM"
+    )
+
+    p = sub.add_parser("snapshot", help="instantané colonnaire d'un semestre")
+    snap = p.add_subparsers(dest="action", required=True)
+    q = snap.add_parser("build", help="construire l'instantané d'une config")
+    q.add_argument("config")
+    q.add_argument(
+        "--date", default=today, help="jour du semestre (défaut : aujourd'hui)"
+    )
+    q.add_argument("--from", dest="first", help="premier jour (défaut : semestre)")
+    q.add_argument("--to", dest="last", help="dernier jour (défaut : semestre)")
+    q.add_argument("-o", "--output", help="nom de l'instantané (dans snapshots/)")
+    q = snap.add_parser("report", help="indicateurs d'un instantané (hors ligne)")
+    q.add_argument("snapshot")
+    q.add_argument(
+        "--weekday",
+        type=int,
+        default=4,
+        choices=range(6),
+        help="jour des salles jamais utilisées (0 = lundi, défaut : 4 = vendredi)",
+    )
+    q.add_argument("--top", type=int, default=10, help="créneaux les plus chargés")
+
+    p = sub.add_parser("prefetch", help="précharger les prochains jours en cache")
+    p.add_argument("configs", nargs="*", help="configs à précharger (défaut : toutes)")
+    p.add_argument(
+        "--entity",
+        action="append",
+        default=[],
+        help="entité type:nom dont précharger la semaine (répétable)",
+    )
+    p.add_argument("--days", type=int, default=2, help="jours ouvrés (défaut : 2)")
+    p.add_argument(
+        "--at",
+        action="append",
+        help="heure quotidienne HH:MM (répétable, défaut : 06:30)",
+    )
+    p.add_argument(
+        "--every", type=int, default=60, help="intervalle en minutes (défaut : 60)"
+    )
+    p.add_argument(
+        "--once", action="store_true", help="précharger une fois puis quitter (cron)"
+    )
+
+    p = sub.add_parser("batch", help="exporter les calendriers d'un manifeste")
+    p.add_argument("manifest", help="fichier JSON ou TOML")
+    p.add_argument("--workers", type=int, help="exports simultanés (défaut : 4)")
+    return parser.parse_args(argv)
+
+
+def run_command(args):
+    """Exécute une sous-commande non interactive ; retourne le code de sortie."""
+    if args.command == "ics":
+        verify_date(args.date)
+        from celcat2ics import parse_entity, run  # pylint: disable=import-outside-toplevel
+
+        entities = resolve_rooms([parse_entity(e, args.type) for e in args.entity])
+        ids = "+".join(entity_id for _, entity_id in entities)
+        name = args.output or f"{ids}-{args.period}_{args.date}"
+        specs = entity_specs(entities)
+        print(run(args.period, args.date, args.type, specs, ics_filename(name)))
+    elif args.command == "config":
+        name = args.output or generate_config_filename(args.dept)
+        from cache import refresh_requested  # pylint: disable=import-outside-toplevel
+        from catalog import load_catalog  # pylint: disable=import-outside-toplevel
+
+        catalog = load_catalog(refresh=refresh_requested())
+        print(export_cfg(catalog, args.dept, name))
+    elif args.command in ("availability", "free", "heatmap"):
+        verify_date(args.date)
+        mode = {"availability": 0, "free": 1, "heatmap": 2}[args.command]
+        if mode == 1:
+            verify_time(args.time)
+            verify_duration(str(args.min_duration))
+            show_availability(
+                args.date, resolve_config(args.config), 1, args.time, args.min_duration
+            )
+        else:
+            show_availability(args.date, resolve_config(args.config), mode)
+    elif args.command == "search":
+        verify_date(args.first)
+        last = args.last or search_end(args.first)
+        verify_date(last)
+        verify_duration(str(args.min_duration))
+        show_free_slots(
+            args.first,
+            last,
+            resolve_config(args.config),
+            args.min_duration,
+            verify_window(args.window),
+        )
+    elif args.command == "snapshot":
+        import snapshot  # pylint: disable=import-outside-toplevel
+
+        if args.action == "report":
+            snapshot.print_report(
+                snapshot.snapshot_path(args.snapshot), args.weekday, args.top
+            )
+            return 0
+        # Les dates ne font que borner la plage : un dimanche y est accepté.
+        verify_date(args.date, allow_sunday=True)
+        first, last = snapshot.semester_range(args.date)
+        for value in (args.first, args.last):
+            if value:
+                verify_date(value, allow_sunday=True)
+        first = datetime.fromisoformat(args.first).date() if args.first else first
+        last = datetime.fromisoformat(args.last).date() if args.last else last
+        config = open_config(resolve_config(args.config))
+        name = args.output or snapshot.default_name(config.name, first, last)
+        out_dir = snapshot.snapshot_path(name)
+        count = snapshot.build_snapshot(config.unique_rooms, first, last, out_dir)
+        print(f"{count} réservations -> {out_dir}")
+    elif args.command == "prefetch":
+        import prefetch  # pylint: disable=import-outside-toplevel
+        from celcat2ics import parse_entity  # pylint: disable=import-outside-toplevel
+
+        try:
+            entities = [parse_entity(spec) for spec in args.entity]
+        except ValueError as err:
+            print(err)
+            return 2
+        entities = resolve_rooms(entities)
+        for hhmm in args.at or ():
+            verify_time(hhmm)
+        configs = prefetch.config_paths(args.configs)
+        if args.once:
+            return 1 if prefetch.prefetch_once(configs, entities, args.days) else 0
+        prefetch.run_schedule(
+            configs, entities, args.days, args.at or prefetch.DEFAULT_AT, args.every
+        )
+    elif args.command == "batch":
+        from batch_export import DEFAULT_WORKERS, load_manifest, run_manifest  # pylint: disable=import-outside-toplevel
+
+        try:
+            items = load_manifest(args.manifest)
+        except (OSError, ValueError) as err:
+            print(f"Manifeste illisible : {err}")
+            return 1
+        workers = args.workers or DEFAULT_WORKERS
+        return 1 if run_manifest(items, workers) else 0
+    return 0
+
+
 if __name__ == "__main__":
+    args = parse_args()
+    if args.no_cache or args.refresh:
+        import cache
+
+        cache.configure(enabled=not args.no_cache, refresh=args.refresh)
+    if args.upstream:
+        import transport
+
+        transport.configure(base_url=args.upstream)
+    if args.stats or args.metrics_out:
+        atexit.register(report_metrics, args.stats, args.metrics_out)
+    if args.command:
+        sys.exit(run_command(args))
     interactive_menu()
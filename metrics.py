@@ -0,0 +1,170 @@
+"""Module de métriques des requêtes CELCAT (latences par phase, compteurs).
+
+Les phases mesurées par requête sont : connect (ouverture de connexion,
+absente si elle est réutilisée), ttfb (envoi jusqu'aux en-têtes de
+réponse), download (lecture du corps), decompress, decode (JSON) et
+total ; la conversion en événements est mesurée dans la phase convert.
+"""
+
+import json
+import os
+import threading
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float("inf"))
+
+
+class Histogram:
+    """Histogramme cumulatif de durées (secondes), façon Prometheus."""
+
+    __slots__ = ("counts", "count", "sum", "max")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        """Ajoute une mesure."""
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Estimation d'un quantile (borne supérieure du seau atteint)."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS, self.counts):
+            seen += n
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        """Représentation JSON."""
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "max": round(self.max, 6),
+            "p50": round(self.quantile(0.5), 6),
+            "p95": round(self.quantile(0.95), 6),
+            "buckets": {
+                str(b): n for b, n in zip(BUCKETS, self.counts) if b != float("inf")
+            },
+        }
+
+
+class Metrics:
+    """Registre thread-safe d'histogrammes et de compteurs par endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+
+    def observe(self, endpoint, phase, seconds):
+        """Enregistre la durée d'une phase d'une requête."""
+        with self._lock:
+            hist = self.histograms.get((endpoint, phase))
+            if hist is None:
+                hist = self.histograms[(endpoint, phase)] = Histogram()
+            hist.observe(seconds)
+
+    def inc(self, endpoint, name, value=1):
+        """Incrémente un compteur (requests, bytes, events, rooms, cache_hits...)."""
+        with self._lock:
+            key = (endpoint, name)
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def reset(self):
+        """Remet toutes les métriques à zéro."""
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def to_dict(self):
+        """Toutes les métriques, regroupées par endpoint."""
+        out = {}
+        with self._lock:
+            for (endpoint, phase), hist in sorted(self.histograms.items()):
+                out.setdefault(endpoint, {}).setdefault("latency", {})[phase] = (
+                    hist.to_dict()
+                )
+            for (endpoint, name), value in sorted(self.counters.items()):
+                out.setdefault(endpoint, {})[name] = value
+        return out
+
+    def to_prometheus(self):
+        """Export au format texte Prometheus (node_exporter textfile)."""
+        lines = [
+            "# TYPE celcat_request_phase_seconds histogram",
+        ]
+        with self._lock:
+            for (endpoint, phase), hist in sorted(self.histograms.items()):
+                labels = f'endpoint="{endpoint}",phase="{phase}"'
+                cumulative = 0
+                for bound, n in zip(BUCKETS, hist.counts):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else str(bound)
+                    lines.append(
+                        f'celcat_request_phase_seconds_bucket{{{labels},le="{le}"}}'
+                        f" {cumulative}"
+                    )
+                lines.append(f"celcat_request_phase_seconds_sum{{{labels}}} {hist.sum}")
+                lines.append(
+                    f"celcat_request_phase_seconds_count{{{labels}}} {hist.count}"
+                )
+            names = sorted({name for _, name in self.counters})
+            for name in names:
+                lines.append(f"# TYPE celcat_{name}_total counter")
+                for (endpoint, n), value in sorted(self.counters.items()):
+                    if n == name:
+                        lines.append(
+                            f'celcat_{name}_total{{endpoint="{endpoint}"}} {value}'
+                        )
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """Résumé lisible (pour --stats)."""
+        data = self.to_dict()
+        if not data:
+            return "Aucune requête CELCAT."
+        lines = []
+        for endpoint, values in data.items():
+            counters = ", ".join(
+                f"{k}={v}" for k, v in values.items() if k != "latency"
+            )
+            lines.append(f"{endpoint} : {counters}")
+            for phase, hist in values.get("latency", {}).items():
+                lines.append(
+                    f"  {phase:<10} n={hist['count']:<5} "
+                    f"p50={hist['p50'] * 1000:.1f} ms  "
+                    f"p95={hist['p95'] * 1000:.1f} ms  "
+                    f"max={hist['max'] * 1000:.1f} ms"
+                )
+        return "\n".join(lines)
+
+    def dump(self, path):
+        """Écrit les métriques dans un fichier (.prom : Prometheus, sinon JSON)."""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            if path.endswith(".prom"):
+                f.write(self.to_prometheus())
+            else:
+                json.dump(self.to_dict(), f, indent=2)
+                f.write("\n")
+        os.replace(tmp_path, path)
+
+
+_registry = Metrics()
+
+
+def get_metrics():
+    """Retourne le registre de métriques partagé."""
+    return _registry
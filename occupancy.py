@@ -0,0 +1,274 @@
+"""Module d'index d'occupation des salles (recherches par dichotomie).
+
+Il sert aussi à la recherche de créneaux libres sur plusieurs jours : la
+plage de dates de chaque salle est récupérée en une requête (vue semaine ou
+mois), puis les créneaux libres de chaque jour sont classés en mémoire.
+"""
+
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+
+from room_availability import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_WORKERS,
+    chunks,
+    colored_icon,
+    day_range,
+    rooms_range_events,
+)
+
+DAY_START = "08:00"
+DAY_END = "18:40"
+DAY_NAMES = ("Lun", "Mar", "Mer", "Jeu", "Ven", "Sam", "Dim")
+
+
+class RoomSchedule:
+    """Créneaux occupés d'une salle, fusionnés et triés par début."""
+
+    __slots__ = ("starts", "ends")
+
+    def __init__(self, events):
+        intervals = sorted(
+            (ev.get("start"), ev.get("end"))
+            for ev in events
+            if ev.get("start") and ev.get("end")
+        )
+        self.starts = []
+        self.ends = []
+        for s, e in intervals:
+            if self.ends and s <= self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], e)
+            else:
+                self.starts.append(s)
+                self.ends.append(e)
+
+    def busy_until(self, at):
+        """Fin du créneau occupé contenant `at`, ou None si la salle est libre."""
+        i = bisect_right(self.starts, at) - 1
+        if i >= 0 and self.ends[i] > at:
+            return self.ends[i]
+        return None
+
+    def next_free_window(self, after, limit):
+        """Premier créneau libre (début, fin) à partir de `after`, borné par `limit`."""
+        start = self.busy_until(after) or after
+        if start >= limit:
+            return None
+        i = bisect_right(self.starts, start)
+        end = self.starts[i] if i < len(self.starts) else limit
+        return (start, min(end, limit))
+
+    def free_windows(self, start, limit):
+        """Tous les créneaux libres (début, fin) entre `start` et `limit`."""
+        windows = []
+        window = self.next_free_window(start, limit)
+        while window is not None:
+            windows.append(window)
+            window = self.next_free_window(window[1], limit)
+        return windows
+
+
+def load_schedules(
+    start,
+    end,
+    cal_view,
+    rooms,
+    workers=DEFAULT_WORKERS,
+    batch_size=DEFAULT_BATCH_SIZE,
+):
+    """Récupère la plage [start, end) de toutes les salles (lots en parallèle).
+
+    Retourne ({salle: événements}, {salle: exception}).
+    """
+    events_by_room = {}
+    errors = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [
+            (chunk, pool.submit(rooms_range_events, start, end, cal_view, chunk))
+            for chunk in chunks(list(dict.fromkeys(rooms)), batch_size)
+        ]
+        for chunk, future in futures:
+            try:
+                result = future.result()
+            except Exception as err:  # pylint: disable=broad-exception-caught
+                result = {room: err for room in chunk}
+            for room, evs in result.items():
+                if isinstance(evs, Exception):
+                    errors[room] = evs
+                else:
+                    events_by_room[room] = evs
+    return events_by_room, errors
+
+
+class OccupancyIndex:
+    """Index d'occupation d'une journée pour un ensemble de salles.
+
+    Une fois la journée chargée, chaque requête se fait en O(log n) par
+    salle, sans nouvel appel à CELCAT.
+    """
+
+    def __init__(self, date_str, events_by_room, errors=None):
+        self.date = datetime.fromisoformat(date_str).date()
+        self.rooms = {room: RoomSchedule(evs) for room, evs in events_by_room.items()}
+        self.errors = errors or {}
+
+    @classmethod
+    def load_day(
+        cls, date_str, rooms, workers=DEFAULT_WORKERS, batch_size=DEFAULT_BATCH_SIZE
+    ):
+        """Charge la journée de toutes les salles (requêtes groupées et parallèles)."""
+        events_by_room, errors = load_schedules(
+            *day_range(date_str), "agendaDay", rooms, workers, batch_size
+        )
+        return cls(date_str, events_by_room, errors)
+
+    def at(self, time_str):
+        """Convertit une heure HH:MM de la journée indexée en datetime UTC."""
+        t = datetime.strptime(time_str, "%H:%M").time()
+        return datetime.combine(self.date, t, tzinfo=timezone.utc)
+
+    def next_free_window(self, room, after):
+        """Prochain créneau libre d'une salle à partir de `after` (datetime ou HH:MM)."""
+        if isinstance(after, str):
+            after = self.at(after)
+        return self.rooms[room].next_free_window(after, self.at(DAY_END))
+
+    def find_free_rooms(self, time_str, min_duration=0):
+        """Salles libres à `time_str` pendant au moins `min_duration` minutes.
+
+        Retourne une liste de (salle, fin du créneau libre), de la plus longue
+        disponibilité à la plus courte.
+        """
+        at = self.at(time_str)
+        limit = self.at(DAY_END)
+        min_delta = timedelta(minutes=min_duration)
+        found = []
+        for room, schedule in self.rooms.items():
+            if schedule.busy_until(at) is not None:
+                continue
+            window = schedule.next_free_window(at, limit)
+            if window and window[1] - window[0] >= min_delta:
+                found.append((room, window[1]))
+        found.sort(key=lambda item: item[1], reverse=True)
+        return found
+
+
+def range_view(first, last):
+    """Vue CELCAT couvrant une plage de jours : semaine si ≤ 7 jours, sinon mois."""
+    return "agendaWeek" if (last - first).days < 7 else "month"
+
+
+def at_time(day, time_str):
+    """Datetime UTC d'une heure HH:MM d'un jour (même convention que to_utc)."""
+    t = datetime.strptime(time_str, "%H:%M").time()
+    return datetime.combine(day, t, tzinfo=timezone.utc)
+
+
+class RangeIndex:
+    """Index d'occupation d'une plage de jours pour un ensemble de salles."""
+
+    def __init__(self, first, last, events_by_room, errors=None):
+        self.first = first
+        self.last = last
+        self.rooms = {room: RoomSchedule(evs) for room, evs in events_by_room.items()}
+        self.errors = errors or {}
+
+    @classmethod
+    def load_range(cls, first, last, rooms, **load_options):
+        """Charge la plage [first, last] de chaque salle en une requête par salle."""
+        events_by_room, errors = load_schedules(
+            first.isoformat(),
+            (last + timedelta(days=1)).isoformat(),
+            range_view(first, last),
+            rooms,
+            **load_options,
+        )
+        return cls(first, last, events_by_room, errors)
+
+    def days(self):
+        """Jours ouvrés (hors dimanche) de la plage."""
+        day = self.first
+        while day <= self.last:
+            if day.weekday() != 6:
+                yield day
+            day += timedelta(days=1)
+
+    def free_slots(self, min_duration, window=(DAY_START, DAY_END)):
+        """Créneaux libres d'au moins `min_duration` minutes dans la fenêtre horaire.
+
+        Retourne {salle: [(début, fin), ...]} dans l'ordre chronologique.
+        """
+        min_delta = timedelta(minutes=min_duration)
+        slots = {}
+        for day in self.days():
+            start, limit = at_time(day, window[0]), at_time(day, window[1])
+            for room, schedule in self.rooms.items():
+                for s, e in schedule.free_windows(start, limit):
+                    if e - s >= min_delta:
+                        slots.setdefault(room, []).append((s, e))
+        return slots
+
+    def rank_rooms(self, min_duration, window=(DAY_START, DAY_END)):
+        """Classe les salles candidates : d'abord celles libres le plus de jours.
+
+        Retourne une liste de (salle, nombre de jours, créneaux) ; à nombre de
+        jours égal, la salle ayant le plus de temps libre passe devant.
+        """
+        ranked = []
+        for room, room_slots in self.free_slots(min_duration, window).items():
+            days = len({s.date() for s, _ in room_slots})
+            free = sum((e - s for s, e in room_slots), timedelta())
+            ranked.append((room, days, free, room_slots))
+        ranked.sort(key=lambda item: (-item[1], -item[2], item[0]))
+        return [(room, days, room_slots) for room, days, _, room_slots in ranked]
+
+
+def format_slot(slot):
+    """Créneau lisible, par ex. « Lun 06 08:00-12:30 »."""
+    s, e = slot
+    return f"{DAY_NAMES[s.weekday()]} {s.day:02d} {s:%H:%M}-{e:%H:%M}"
+
+
+def print_free_slots(
+    first, last, rooms, max_len, min_duration, window=(DAY_START, DAY_END), top=10
+):
+    """Affiche les meilleures salles pour un créneau libre sur une plage de jours."""
+    if isinstance(first, str):
+        first = date.fromisoformat(first)
+    if isinstance(last, str):
+        last = date.fromisoformat(last)
+    index = RangeIndex.load_range(first, last, rooms)
+    n_days = sum(1 for _ in index.days())
+    ranked = index.rank_rooms(min_duration, window)[:top]
+    if not ranked:
+        print(
+            f"Aucune salle libre pendant {min_duration} minutes "
+            f"entre {window[0]} et {window[1]} du {first} au {last}."
+        )
+    for room, days, room_slots in ranked:
+        icon = colored_icon("✓", days < n_days)
+        slots = ", ".join(format_slot(slot) for slot in room_slots)
+        print(f"{room.ljust(max_len)}  {icon}{days}/{n_days} j  {slots}")
+    for room, err in index.errors.items():
+        print(f"{room.ljust(max_len)}  {colored_icon('?', True)} Erreur : {err}")
+
+
+def find_free_rooms(date_str, time_str, min_duration, rooms, **load_options):
+    """Charge la journée puis retourne les salles libres triées (voir OccupancyIndex)."""
+    index = OccupancyIndex.load_day(date_str, rooms, **load_options)
+    return index.find_free_rooms(time_str, min_duration)
+
+
+def print_free_rooms(date, rooms, max_len, time, min_duration=0):
+    """Affiche les salles libres, triées par durée de disponibilité."""
+    index = OccupancyIndex.load_day(date, rooms)
+    free = index.find_free_rooms(time, min_duration)
+    if not free:
+        print(f"Aucune salle libre à {time} pendant au moins {min_duration} minutes.")
+    for room, until in free:
+        name_aligned = room.ljust(max_len)
+        icon = colored_icon("✓", False)
+        print(f"{name_aligned}  {icon} Disponible jusqu'à {until.strftime('%H:%M')}")
+    for room, err in index.errors.items():
+        print(f"{room.ljust(max_len)}  {colored_icon('?', True)} Erreur : {err}")
@@ -0,0 +1,219 @@
+"""Module de matrice d'occupation hebdomadaire (NumPy) et de carte de chaleur."""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    np = None
+
+from room_availability import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_WORKERS,
+    chunks,
+    rooms_range_events,
+    subtitle,
+    title,
+)
+from room_config import BLANK, SUBTITLE, TITLE
+
+SLOT_MINUTES = 15
+DAY_START = "08:00"
+DAY_END = "19:00"
+WEEK_DAYS = 6
+DAY_NAMES = ["Lun", "Mar", "Mer", "Jeu", "Ven", "Sam", "Dim"]
+SHADES = " ░▒▓█"
+
+
+def require_numpy():
+    """Vérifie que NumPy est installé."""
+    if np is None:
+        raise RuntimeError("Cette fonctionnalité nécessite numpy (pip install numpy).")
+
+
+def minutes(time_str):
+    """Convertit une heure HH:MM en minutes depuis minuit."""
+    t = datetime.strptime(time_str, "%H:%M")
+    return t.hour * 60 + t.minute
+
+
+class OccupancyMatrix:
+    """Matrice booléenne d'occupation salles × jours × créneaux.
+
+    `busy[r, d, s]` vaut True si la salle r est occupée pendant le créneau s
+    (de `slot_minutes` minutes à partir de `day_start`) du jour d.
+    """
+
+    def __init__(
+        self,
+        rooms,
+        first_day,
+        days=WEEK_DAYS,
+        slot_minutes=SLOT_MINUTES,
+        day_start=DAY_START,
+        day_end=DAY_END,
+    ):
+        require_numpy()
+        self.rooms = list(rooms)
+        self.room_index = {room: i for i, room in enumerate(self.rooms)}
+        self.first_day = datetime.fromisoformat(str(first_day)).date()
+        self.days = days
+        self.slot_minutes = slot_minutes
+        self.day_start = minutes(day_start)
+        self.slots = -(-(minutes(day_end) - self.day_start) // slot_minutes)
+        self.busy = np.zeros((len(self.rooms), days, self.slots), dtype=bool)
+        self.errors = {}
+
+    def slot(self, time_str):
+        """Indice du créneau contenant l'heure HH:MM (borné à la journée)."""
+        s = (minutes(time_str) - self.day_start) // self.slot_minutes
+        return int(min(max(s, 0), self.slots))
+
+    def fill(self, events_by_room):
+        """Remplit la matrice à partir des événements de chaque salle.
+
+        Les intervalles sont convertis en créneaux de façon vectorisée : on
+        accumule +1/-1 aux bornes dans un tableau de différences, puis une
+        somme cumulée donne l'occupation de chaque créneau.
+        """
+        origin = datetime.combine(self.first_day, datetime.min.time(), timezone.utc)
+        rows, starts, ends = [], [], []
+        for room, events in events_by_room.items():
+            r = self.room_index.get(room)
+            if r is None:
+                continue
+            for ev in events:
+                s = ev.get("start")
+                e = ev.get("end")
+                if s and e:
+                    rows.append(r)
+                    starts.append((s - origin).total_seconds() // 60)
+                    ends.append((e - origin).total_seconds() // 60)
+        if not rows:
+            return self
+        rows = np.asarray(rows, dtype=np.intp)
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        day = starts // 1440
+        keep = (day >= 0) & (day < self.days)
+        rows, starts, ends, day = rows[keep], starts[keep], ends[keep], day[keep]
+        day_origin = day * 1440 + self.day_start
+        first = np.clip((starts - day_origin) // self.slot_minutes, 0, self.slots)
+        last = np.clip(-(-(ends - day_origin) // self.slot_minutes), 0, self.slots)
+        keep = last > first
+        rows, day, first, last = rows[keep], day[keep], first[keep], last[keep]
+        diff = np.zeros((len(self.rooms), self.days, self.slots + 1), dtype=np.int32)
+        np.add.at(diff, (rows, day, first), 1)
+        np.add.at(diff, (rows, day, last), -1)
+        self.busy |= np.cumsum(diff, axis=2)[:, :, : self.slots] > 0
+        return self
+
+    @classmethod
+    def load_week(
+        cls,
+        date_str,
+        rooms,
+        workers=DEFAULT_WORKERS,
+        batch_size=DEFAULT_BATCH_SIZE,
+        **options,
+    ):
+        """Charge la semaine (lundi à samedi) contenant `date_str`."""
+        d = datetime.fromisoformat(date_str).date()
+        monday = d - timedelta(days=d.weekday())
+        matrix = cls(rooms, monday, **options)
+        start = monday.isoformat()
+        end = (monday + timedelta(days=6)).isoformat()
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = [
+                (
+                    chunk,
+                    pool.submit(rooms_range_events, start, end, "agendaWeek", chunk),
+                )
+                for chunk in chunks(list(dict.fromkeys(rooms)), batch_size)
+            ]
+            for chunk, future in futures:
+                try:
+                    result = future.result()
+                except Exception as err:  # pylint: disable=broad-exception-caught
+                    result = {room: err for room in chunk}
+                ok = {}
+                for room, evs in result.items():
+                    if isinstance(evs, Exception):
+                        matrix.errors[room] = evs
+                    else:
+                        ok[room] = evs
+                matrix.fill(ok)
+        return matrix
+
+    def free_between(self, time_from, time_to, days=None):
+        """Salles libres sur toute la plage horaire, pour chacun des jours donnés."""
+        days = list(range(self.days)) if days is None else list(days)
+        window = self.busy[:, days, self.slot(time_from) : self.slot(time_to)]
+        free = ~window.any(axis=(1, 2))
+        return [room for room, ok in zip(self.rooms, free) if ok]
+
+    def half_days_busy(self, day):
+        """Occupation matin (8h-13h) / après-midi (13h-18h) de chaque salle.
+
+        Retourne un tableau (salles × 2), obtenu en une seule réduction.
+        """
+        bounds = [self.slot("08:00"), self.slot("13:00"), self.slot("18:00")]
+        return np.logical_or.reduceat(self.busy[:, day, :], bounds, axis=1)[:, :2]
+
+    def hourly_load(self):
+        """Taux d'occupation par salle, jour et heure (salles × jours × heures)."""
+        per_hour = max(1, 60 // self.slot_minutes)
+        hours = -(-self.slots // per_hour)
+        padded = np.zeros(
+            (len(self.rooms), self.days, hours * per_hour), dtype=np.float32
+        )
+        padded[:, :, : self.slots] = self.busy
+        return padded.reshape(len(self.rooms), self.days, hours, per_hour).mean(axis=3)
+
+
+def heat_cell(load):
+    """Case colorée de la carte de chaleur pour un taux d'occupation."""
+    green = "\x1b[32m"
+    yellow = "\x1b[33m"
+    red = "\x1b[31m"
+    reset = "\x1b[0m"
+    if load <= 0:
+        return f"{green}·{reset}"
+    color = red if load >= 0.5 else yellow
+    shade = SHADES[min(len(SHADES) - 1, 1 + int(load * (len(SHADES) - 1)))]
+    return f"{color}{shade}{reset}"
+
+
+def print_week_heatmap(date, config):
+    """Affiche la carte d'occupation de la semaine pour toutes les salles d'une config."""
+    max_len = config.max_len
+    matrix = OccupancyMatrix.load_week(date, config.unique_rooms)
+    load = matrix.hourly_load()
+    hours = load.shape[2]
+    header = " ".join(
+        f"{DAY_NAMES[d]} {(matrix.first_day + timedelta(days=d)).day:02d}".ljust(hours)
+        for d in range(matrix.days)
+    )
+    width = max_len + 2 + len(header) - 6
+    print(f"{' ' * (max_len + 2)}{header}")
+    for kind, text in config.entries:
+        if kind == BLANK:
+            print()
+            continue
+        if kind == SUBTITLE:
+            subtitle(text, width)
+            continue
+        if kind == TITLE:
+            title(text, width)
+            continue
+        name_aligned = text.ljust(max_len)
+        if text in matrix.errors:
+            print(f"{name_aligned}  Erreur : {matrix.errors[text]}")
+            continue
+        r = matrix.room_index[text]
+        cells = " ".join(
+            "".join(heat_cell(load[r, d, h]) for h in range(hours))
+            for d in range(matrix.days)
+        )
+        print(f"{name_aligned}  {cells}")
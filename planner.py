@@ -0,0 +1,150 @@
+"""Module de planification des requêtes GetCalendarData.
+
+Chaque appelant décrit un besoin : (resType, entité, plage [début, fin),
+vue qu'il aurait utilisée). Le planificateur fusionne les plages
+adjacentes ou chevauchantes d'une même entité (au plus MAX_SPAN_DAYS
+jours par appel), regroupe en lots les entités de même type dont la plage
+fusionnée est identique, choisit la vue CELCAT selon la durée, puis
+redécoupe les réponses pour rendre à chaque besoin ses seuls événements.
+"""
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+
+from cache import get_cache, make_key, ttl_for
+from celcat2ics import fetch_by_entity, post_calendar, to_utc
+
+MAX_SPAN_DAYS = 31
+BATCH_SIZE = 10
+WORKERS = 4
+
+Need = namedtuple("Need", "res_type entity start end cal_view")
+
+
+def as_date(value):
+    """Date d'une valeur ISO (AAAA-MM-JJ) ou date."""
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+def view_for(start, end):
+    """Vue CELCAT d'une plage : jour, semaine (≤ 7 jours) ou mois."""
+    days = (end - start).days
+    if days <= 1:
+        return "agendaDay"
+    if days <= 7:
+        return "agendaWeek"
+    return "month"
+
+
+def slice_items(items, start, end):
+    """Événements bruts qui chevauchent [start, end) (dates, minuit UTC)."""
+    lo = datetime.combine(start, datetime.min.time(), timezone.utc)
+    hi = datetime.combine(end, datetime.min.time(), timezone.utc)
+    kept = []
+    for item in items:
+        s = item.get("start")
+        e = item.get("end") or s
+        if not s or (to_utc(s) < hi and to_utc(e) > lo):
+            kept.append(item)
+    return kept
+
+
+class FetchPlanner:
+    """Regroupe des besoins de calendrier en un minimum d'appels CELCAT."""
+
+    def __init__(self, max_span_days=MAX_SPAN_DAYS, batch_size=BATCH_SIZE):
+        self.max_span_days = max_span_days
+        self.batch_size = batch_size
+        self.needs = []
+
+    def add(self, res_type, entity, start, end, cal_view=None):
+        """Ajoute un besoin et retourne sa clé (à chercher dans le résultat de run)."""
+        need = Need(res_type, entity, as_date(start), as_date(end), cal_view)
+        self.needs.append(need)
+        return need
+
+    def plan(self):
+        """Appels à effectuer : liste de (resType, début, fin, vue, entités, besoins).
+
+        Pour chaque entité, les plages triées sont fusionnées tant qu'elles se
+        touchent ou se chevauchent et que l'appel reste sous max_span_days ;
+        un besoin est toujours couvert en entier par un seul appel.
+        """
+        by_entity = {}
+        for need in dict.fromkeys(self.needs):
+            by_entity.setdefault((need.res_type, need.entity), []).append(need)
+        ranges = {}
+        for (res_type, entity), needs in by_entity.items():
+            needs.sort(key=lambda n: (n.start, n.end))
+            groups = []
+            for need in needs:
+                if groups:
+                    start, end, covered = groups[-1]
+                    span = (max(end, need.end) - start).days
+                    if need.start <= end and span <= self.max_span_days:
+                        groups[-1] = (start, max(end, need.end), covered + [need])
+                        continue
+                groups.append((need.start, need.end, [need]))
+            for start, end, covered in groups:
+                key = (res_type, start, end)
+                ranges.setdefault(key, {})[entity] = covered
+        calls = []
+        for (res_type, start, end), per_entity in ranges.items():
+            entities = list(per_entity)
+            for i in range(0, len(entities), max(1, self.batch_size)):
+                batch = entities[i : i + max(1, self.batch_size)]
+                needs = [n for entity in batch for n in per_entity[entity]]
+                calls.append((res_type, start, end, view_for(start, end), batch, needs))
+        return calls
+
+    def run(self, workers=WORKERS, store=False):
+        """Exécute le plan et retourne {besoin: événements bruts, ou exception}.
+
+        Avec `store`, la part de chaque besoin est aussi enregistrée dans le
+        cache local sous la clé qu'aurait utilisée son appelant (même plage,
+        même vue, entité seule), pour les appels directs qui suivront.
+        """
+        calls = self.plan()
+        results = {}
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = [(call, pool.submit(self.execute, call)) for call in calls]
+            for (_, start, end, _, batch, needs), future in futures:
+                try:
+                    per_entity = future.result()
+                except Exception as err:  # pylint: disable=broad-exception-caught
+                    per_entity = {entity: err for entity in batch}
+                for need in needs:
+                    data = per_entity[need.entity]
+                    if isinstance(data, Exception):
+                        results[need] = data
+                        continue
+                    if (need.start, need.end) == (start, end):
+                        results[need] = data
+                    else:
+                        results[need] = slice_items(data, need.start, need.end)
+                    if store:
+                        self.store(need, results[need])
+        return results
+
+    @staticmethod
+    def execute(call):
+        """Effectue un appel groupé et répartit les événements par entité."""
+        res_type, start, end, cal_view, batch, _ = call
+
+        def fetch(ids):
+            return post_calendar(
+                start.isoformat(), end.isoformat(), res_type, cal_view, ids
+            )
+
+        return fetch_by_entity(fetch, res_type, batch)
+
+    @staticmethod
+    def store(need, items):
+        """Enregistre la part d'un besoin dans le cache, sous sa propre clé."""
+        cache = get_cache()
+        if cache is None or need.cal_view is None:
+            return
+        start, end = need.start.isoformat(), need.end.isoformat()
+        key = make_key(start, end, need.res_type, need.cal_view, [need.entity])
+        cache.put(key, items, ttl_for(end))
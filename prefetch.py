@@ -0,0 +1,124 @@
+"""Module de préchargement des emplois du temps dans le cache local.
+
+Le préchargement interroge CELCAT pour les prochains jours par le même
+chemin que les requêtes interactives (mêmes lots de salles, donc mêmes clés
+de cache) et enregistre les réponses avec une validité PREFETCH_TTL. Il
+peut être lancé une fois (cron) ou en boucle : chaque jour aux heures
+`at`, puis toutes les `every` minutes.
+"""
+
+import os
+import time
+from datetime import date, datetime, timedelta
+
+import cache
+from celcat2ics import PERIOD_TO_VIEW, RES_TYPES, compute_range
+from planner import FetchPlanner
+from room_availability import rooms_statuses
+from room_config import load_config
+
+CONFIG_DIR = "configs"
+DEFAULT_DAYS = 2
+DEFAULT_AT = ("06:30",)
+DEFAULT_EVERY = 60
+
+
+def upcoming_days(days=DEFAULT_DAYS, start=None):
+    """Les `days` prochains jours ouvrés (hors dimanche), à partir de `start`."""
+    day = start or date.today()
+    result = []
+    while len(result) < days:
+        if day.weekday() != 6:
+            result.append(day.isoformat())
+        day += timedelta(days=1)
+    return result
+
+
+def config_paths(names=None, config_dir=CONFIG_DIR):
+    """Chemins des configs données, ou de toutes celles de `config_dir`."""
+    if names:
+        return [
+            name if os.path.isfile(name) else os.path.join(config_dir, name)
+            for name in names
+        ]
+    if not os.path.isdir(config_dir):
+        return []
+    return [
+        os.path.join(config_dir, name)
+        for name in sorted(os.listdir(config_dir))
+        if os.path.isfile(os.path.join(config_dir, name))
+    ]
+
+
+def prefetch_rooms(configs, days, out):
+    """Précharge les salles des configs ; retourne (échecs, salles demandées)."""
+    failures = 0
+    requested = 0
+    for day in upcoming_days(days):
+        for path in configs:
+            config = load_config(path)
+            statuses = rooms_statuses(day, config.unique_rooms, 0)
+            errors = [r for r, s in statuses.items() if isinstance(s, Exception)]
+            requested += len(statuses)
+            failures += len(errors)
+            if errors:
+                out(f"{day} {config.name} : {len(errors)} salle(s) en échec")
+    return failures, requested
+
+
+def prefetch_once(configs=(), entities=(), days=DEFAULT_DAYS, out=print):
+    """Précharge les salles des configs et les semaines des entités.
+
+    Retourne le nombre d'échecs (salles ou entités) ; les réponses obtenues
+    sont enregistrées dans le cache avec une validité PREFETCH_TTL. Les
+    réglages du cache sont rétablis ensuite, et un cache désactivé le reste.
+    """
+    t0 = time.perf_counter()
+    with cache.overridden(refresh=True, future_ttl=cache.PREFETCH_TTL):
+        if cache.get_cache() is None:
+            out("Cache désactivé : les réponses ne seront pas enregistrées.")
+        failures, requested = prefetch_rooms(configs, days, out)
+        planner = FetchPlanner()
+        start, end = compute_range("week", upcoming_days(1)[0])
+        for entity_type, name in entities:
+            planner.add(
+                RES_TYPES[entity_type], name, start, end, PERIOD_TO_VIEW["week"]
+            )
+        for need, data in planner.run(store=True).items():
+            requested += 1
+            if isinstance(data, Exception):
+                failures += 1
+                out(f"{need.entity} : {data}")
+    out(
+        f"Préchargement : {requested} élément(s), {failures} échec(s) "
+        f"en {time.perf_counter() - t0:.1f} s"
+    )
+    return failures
+
+
+def next_run(now, at=DEFAULT_AT, every=DEFAULT_EVERY, last=None):
+    """Date du prochain préchargement : heure fixe `at` ou `every` min après `last`."""
+    candidates = []
+    for hhmm in at:
+        t = datetime.strptime(hhmm, "%H:%M").time()
+        run_at = datetime.combine(now.date(), t)
+        if run_at <= now:
+            run_at += timedelta(days=1)
+        candidates.append(run_at)
+    if every and last is not None:
+        candidates.append(max(now, last + timedelta(minutes=every)))
+    if not candidates:
+        return now + timedelta(minutes=every or DEFAULT_EVERY)
+    return min(candidates)
+
+
+def run_schedule(
+    configs=(), entities=(), days=DEFAULT_DAYS, at=DEFAULT_AT, every=DEFAULT_EVERY
+):
+    """Précharge immédiatement puis selon le planning, jusqu'à interruption."""
+    while True:
+        last = datetime.now()
+        prefetch_once(configs, entities, days)
+        wake = next_run(datetime.now(), at, every, last)
+        print(f"Prochain préchargement : {wake:%Y-%m-%d %H:%M}")
+        time.sleep(max(0.0, (wake - datetime.now()).total_seconds()))
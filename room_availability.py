@@ -1,7 +1,20 @@
 """Module pour vérifier la disponibilité des salles."""
 
+import re
+import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta, timezone
-from celcat2ics import post_calendar, calendar_json_to_events
+from celcat2ics import (
+    post_calendar,
+    calendar_json_to_events,
+    fetch_by_entity,
+)
+from room_config import BLANK, ROOM, SUBTITLE, TITLE
+
+DEFAULT_WORKERS = 8
+DEFAULT_BATCH_SIZE = 10
+_ANSI_RE = re.compile(r"\x1b\[[0-9;]*[A-Za-z]")
 
 
 def overlaps(a_start, a_end, b_start, b_end):
@@ -9,81 +22,131 @@ def overlaps(a_start, a_end, b_start, b_end):
     return a_start < b_end and a_end > b_start
 
 
-def single_room_availability(date_str, room):
-    """Vérifie la disponibilité d'une salle pour une journée (matin et après-midi)."""
-    tz = timezone.utc
+def room_range_events(start, end, cal_view, room):
+    """Récupère les événements d'une salle sur une plage de dates."""
+    data = post_calendar(start, end, 102, cal_view, [room])
+    if isinstance(data, list) and data:
+        return calendar_json_to_events(data, [room])
+    return []
+
+
+def day_range(date_str):
+    """Retourne la plage [jour, lendemain) d'une date, au format ISO."""
     d = datetime.fromisoformat(date_str).date()
-    dn = d + timedelta(days=1)
+    return d.isoformat(), (d + timedelta(days=1)).isoformat()
+
+
+def room_day_events(date_str, room):
+    """Récupère les événements d'une salle pour une journée."""
+    return room_range_events(*day_range(date_str), "agendaDay", room)
 
-    data = post_calendar(d.isoformat(), dn.isoformat(), 102, "agendaDay", [room])
-    events = []
+
+def half_days_busy(date_str, events):
+    """Calcule l'occupation du matin et de l'après-midi à partir des événements."""
+    tz = timezone.utc
+    d = datetime.fromisoformat(date_str).date()
     morning_busy = False
     afternoon_busy = False
+    for ev in events:
+        s = ev.get("start")
+        e = ev.get("end")
+        if not s or not e:
+            continue
+        s_local = s.astimezone(tz)
+        e_local = e.astimezone(tz)
 
-    if isinstance(data, list) and data:
-        events = calendar_json_to_events(data, [room])
-        for ev in events:
-            s = ev.get("start")
-            e = ev.get("end")
-            if not s or not e:
-                continue
-            s_local = s.astimezone(tz)
-            e_local = e.astimezone(tz)
-
-            morning_busy = morning_busy or overlaps(
-                s_local,
-                e_local,
-                datetime(d.year, d.month, d.day, 8, 0, tzinfo=tz),
-                datetime(d.year, d.month, d.day, 13, 0, tzinfo=tz),
-            )
+        morning_busy = morning_busy or overlaps(
+            s_local,
+            e_local,
+            datetime(d.year, d.month, d.day, 8, 0, tzinfo=tz),
+            datetime(d.year, d.month, d.day, 13, 0, tzinfo=tz),
+        )
 
-            afternoon_busy = afternoon_busy or overlaps(
-                s_local,
-                e_local,
-                datetime(d.year, d.month, d.day, 13, 0, tzinfo=tz),
-                datetime(d.year, d.month, d.day, 18, 0, tzinfo=tz),
-            )
+        afternoon_busy = afternoon_busy or overlaps(
+            s_local,
+            e_local,
+            datetime(d.year, d.month, d.day, 13, 0, tzinfo=tz),
+            datetime(d.year, d.month, d.day, 18, 0, tzinfo=tz),
+        )
     return (morning_busy, afternoon_busy)
 
 
-def single_room_availability_at_time(date_str, time_str, room):
-    """Vérifie si une salle est disponible, et jusqu'à quelle heure."""
+def available_until(date_str, time_str, events):
+    """Calcule si une salle est libre à une heure donnée, et jusqu'à quand."""
     tz = timezone.utc
     d = datetime.fromisoformat(date_str).date()
     t = datetime.strptime(time_str, "%H:%M").time()
     dt = datetime.combine(d, t, tzinfo=tz)
-    data = post_calendar(
-        d.isoformat(),
-        (d + timedelta(days=1)).isoformat(),
-        102,
-        "agendaDay",
-        [room],
-    )
-
     next_event_start = None
 
-    if isinstance(data, list) and data:
-        events = calendar_json_to_events(data, [room])
-        for ev in events:
-            s = ev.get("start")
-            e = ev.get("end")
-            if not s or not e:
-                continue
-            s_local = s.astimezone(tz)
-            e_local = e.astimezone(tz)
-
-            if s_local <= dt < e_local:
-                return (False, e_local.time().strftime("%H:%M"))
-
-            if dt < s_local < datetime(d.year, d.month, d.day, 18, 40, tzinfo=tz):
-                if next_event_start is None or s_local < next_event_start:
-                    next_event_start = s_local
+    for ev in events:
+        s = ev.get("start")
+        e = ev.get("end")
+        if not s or not e:
+            continue
+        s_local = s.astimezone(tz)
+        e_local = e.astimezone(tz)
+
+        if s_local <= dt < e_local:
+            return (False, e_local.time().strftime("%H:%M"))
+
+        if dt < s_local < datetime(d.year, d.month, d.day, 18, 40, tzinfo=tz):
+            if next_event_start is None or s_local < next_event_start:
+                next_event_start = s_local
 
     if next_event_start is not None:
         return (True, next_event_start.time().strftime("%H:%M"))
     return (True, "18:40")
 
 
+def single_room_availability(date_str, room):
+    """Vérifie la disponibilité d'une salle pour une journée (matin et après-midi)."""
+    return half_days_busy(date_str, room_day_events(date_str, room))
+
+
+def single_room_availability_at_time(date_str, time_str, room):
+    """Vérifie si une salle est disponible, et jusqu'à quelle heure."""
+    return available_until(date_str, time_str, room_day_events(date_str, room))
+
+
+def rooms_range_events(start, end, cal_view, rooms):
+    """Récupère les événements d'un lot de salles en une seule requête.
+
+    Les événements sont répartis par salle (voir fetch_by_entity) ; une
+    salle en échec reçoit l'exception au lieu de sa liste d'événements.
+    """
+
+    def fetch(batch):
+        return post_calendar(start, end, 102, cal_view, batch)
+
+    return {
+        room: items
+        if isinstance(items, Exception)
+        else calendar_json_to_events(items, [room])
+        for room, items in fetch_by_entity(fetch, 102, rooms).items()
+    }
+
+
+def rooms_day_events(date_str, rooms):
+    """Récupère les événements d'un lot de salles pour une journée (voir rooms_range_events)."""
+    return rooms_range_events(*day_range(date_str), "agendaDay", rooms)
+
+
+def chunks(items, size):
+    """Découpe une liste en lots de taille `size`."""
+    size = max(1, size)
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+def room_status(date, mode, events, time=None):
+    """Calcule l'état d'une salle selon le mode à partir de ses événements."""
+    if isinstance(events, Exception):
+        raise events
+    if mode == 0:
+        return half_days_busy(date, events)
+    return available_until(date, time, events)
+
+
 def colored_icon(icon: str, is_busy: bool):
     """Retourne une icône colorée selon la disponibilité."""
     green = "\x1b[32m"
@@ -109,50 +172,194 @@ def title(text, max_len):
     print(f"{bold}{underline}{spaces}{text}{spaces}{reset}")
 
 
-def pre_process(cfg):
-    """Prétraite un fichier de config pour extraire le nombre de salles et le nom le plug long."""
-    rooms = 0
-    max_len = 0
-    with open(cfg, "r", encoding="utf-8") as f:
-        for line in f:
-            if not line or line.startswith("#"):
-                continue
-            rooms += 1
-            max_len = max(max_len, len(line.rstrip("\n")))
-    return rooms, max_len
-
-
-def print_availability(date, cfg, max_len, mode, time=None):
-    """Affiche la disponibilité de toutes les salles du fichier de config."""
-    with open(cfg, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.rstrip("\n")
-            if line == "":
-                print()
-                continue
-            if line.startswith("##"):
-                subtitle(line[2:].strip(), max_len)
-                continue
-            if line.startswith("#"):
-                title(line[1:].strip(), max_len)
-                continue
-            if mode == 0:
-                (morning_busy, evening_busy) = single_room_availability(date, line)
-                sun = colored_icon("𖤓", morning_busy)
-                moon = colored_icon("☾", evening_busy)
-                name_aligned = line.rstrip("\n").ljust(max_len)
-                print(f"{name_aligned}  {sun}{moon}")
+def format_room_row(room, max_len, mode, status):
+    """Formate la ligne d'une salle à partir de son état."""
+    name_aligned = room.ljust(max_len)
+    if mode == 0:
+        (morning_busy, evening_busy) = status
+        sun = colored_icon("𖤓", morning_busy)
+        moon = colored_icon("☾", evening_busy)
+        return f"{name_aligned}  {sun}{moon}"
+    (is_available, until_time) = status
+    icon = (
+        colored_icon("✓", not is_available)
+        if is_available
+        else colored_icon("✘", not is_available)
+    )
+    if is_available:
+        return f"{name_aligned}  {icon} Disponible jusqu'à {until_time}"
+    return f"{name_aligned}  {icon} Occupée jusqu'à {until_time}"
+
+
+def format_error_row(room, max_len, err):
+    """Formate la ligne d'une salle dont la requête a échoué."""
+    name_aligned = room.ljust(max_len)
+    return f"{name_aligned}  {colored_icon('?', True)} Erreur : {err}"
+
+
+def submit_room_chunks(pool, date, rooms, batch_size=1):
+    """Lance les requêtes des salles par lots ; retourne {future: salles du lot}."""
+    return {
+        pool.submit(rooms_day_events, date, chunk): chunk
+        for chunk in chunks(list(dict.fromkeys(rooms)), batch_size)
+    }
+
+
+def submit_room_statuses(pool, date, rooms, mode, time=None, batch_size=1):
+    """Lance les requêtes des salles et retourne, par salle, une fonction d'attente.
+
+    Avec `batch_size` > 1, les salles sont regroupées par lots dans une même
+    requête CELCAT ; appeler la fonction d'une salle renvoie son état ou lève
+    l'exception de la requête correspondante.
+    """
+    pending = {}
+    for future, chunk in submit_room_chunks(pool, date, rooms, batch_size).items():
+        for room in chunk:
+            pending[room] = lambda f=future, r=room: room_status(
+                date, mode, f.result()[r], time
+            )
+    return pending
+
+
+def room_row(room, max_len, mode, wait):
+    """Ligne d'une salle : état renvoyé par `wait()`, ou erreur de sa requête."""
+    try:
+        status = wait()
+    except Exception as err:  # pylint: disable=broad-exception-caught
+        return format_error_row(room, max_len, err)
+    return format_room_row(room, max_len, mode, status)
+
+
+def print_entry(kind, text, max_len):
+    """Affiche une ligne de config qui n'est pas une salle."""
+    if kind == BLANK:
+        print()
+    elif kind == SUBTITLE:
+        subtitle(text, max_len)
+    elif kind == TITLE:
+        title(text, max_len)
+
+
+def visible_len(text):
+    """Largeur affichée d'une ligne, sans ses séquences ANSI."""
+    return len(_ANSI_RE.sub("", text))
+
+
+def clip_row(row, width):
+    """Tronque une ligne à `width` caractères visibles (séquences ANSI gardées)."""
+    row = " ".join(row.splitlines())
+    if visible_len(row) <= width:
+        return row
+    out = []
+    shown = 0
+    pos = 0
+    for match in _ANSI_RE.finditer(row):
+        plain = row[pos : match.start()]
+        keep = max(0, width - 1 - shown)
+        out.append(plain[:keep])
+        shown += min(len(plain), keep)
+        out.append(match.group())
+        pos = match.end()
+    out.append(row[pos:][: max(0, width - 1 - shown)])
+    return "".join(out) + "…\x1b[0m"
+
+
+def fits_terminal(config):
+    """Indique si le squelette du tableau de `config` tient dans le terminal.
+
+    Chaque entrée doit occuper une seule ligne physique : le tableau doit
+    être moins haut que le terminal, et ses titres et salles moins larges.
+    """
+    if not sys.stdout.isatty():
+        return False
+    size = shutil.get_terminal_size()
+    width = max(
+        [config.max_len + 6] + [len(text) for kind, text in config.entries], default=0
+    )
+    return len(config.entries) < size.lines and width < size.columns
+
+
+def rooms_statuses(
+    date, rooms, mode, time=None, workers=DEFAULT_WORKERS, batch_size=DEFAULT_BATCH_SIZE
+):
+    """Retourne l'état de chaque salle (ou l'exception de sa requête)."""
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        pending = submit_room_statuses(pool, date, rooms, mode, time, batch_size)
+        for room, wait in pending.items():
+            try:
+                results[room] = wait()
+            except Exception as err:  # pylint: disable=broad-exception-caught
+                results[room] = err
+    return results
+
+
+def print_availability(
+    date,
+    config,
+    mode,
+    time=None,
+    workers=DEFAULT_WORKERS,
+    batch_size=DEFAULT_BATCH_SIZE,
+    progressive=None,
+):
+    """Affiche la disponibilité de toutes les salles d'une config compilée.
+
+    Les salles sont interrogées en parallèle par `workers` threads, par lots
+    de `batch_size` salles. En mode progressif (par défaut si la sortie est
+    un terminal assez haut), le tableau est dessiné d'emblée et chaque
+    ligne est complétée sur place dès que son lot arrive ; sinon les lignes
+    sont affichées dans l'ordre du fichier de config.
+    """
+    if progressive is None:
+        progressive = fits_terminal(config)
+    max_len = config.max_len
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        if progressive:
+            futures = submit_room_chunks(pool, date, config.unique_rooms, batch_size)
+            render_progressive(config, mode, futures, date, time)
+            return
+        pending = submit_room_statuses(
+            pool, date, config.unique_rooms, mode, time, batch_size
+        )
+        for kind, text in config.entries:
+            if kind == ROOM:
+                print(room_row(text, max_len, mode, pending[text]), flush=True)
             else:
-                (is_available, until_time) = single_room_availability_at_time(
-                    date, time, line
-                )
-                icon = (
-                    colored_icon("✓", not is_available)
-                    if is_available
-                    else colored_icon("✘", not is_available)
-                )
-                name_aligned = line.rstrip("\n").ljust(max_len)
-                if is_available:
-                    print(f"{name_aligned}  {icon} Disponible jusqu'à {until_time}")
-                else:
-                    print(f"{name_aligned}  {icon} Occupée jusqu'à {until_time}")
+                print_entry(kind, text, max_len)
+
+
+def render_progressive(config, mode, futures, date, time=None):
+    """Dessine le squelette du tableau puis remplit les lignes dans l'ordre d'arrivée.
+
+    Chaque ligne est réécrite avec des séquences ANSI : remonter de n lignes
+    (CSI n F), effacer la ligne (CSI 2K), puis redescendre (CSI n E). Les
+    lignes sont tronquées à la largeur du terminal pour ne jamais passer à
+    la ligne, ce qui décalerait ces déplacements.
+    """
+    max_len = config.max_len
+    dim = "\x1b[2m"
+    reset = "\x1b[0m"
+    positions = {}
+    for line_no, (kind, text) in enumerate(config.entries):
+        if kind == ROOM:
+            positions.setdefault(text, []).append(line_no)
+            print(f"{text.ljust(max_len)}  {dim}…{reset}")
+        else:
+            print_entry(kind, text, max_len)
+    sys.stdout.flush()
+    total = len(config.entries)
+    width = shutil.get_terminal_size().columns - 1
+    for future in as_completed(futures):
+        for room in futures[future]:
+            row = room_row(
+                room,
+                max_len,
+                mode,
+                lambda f=future, r=room: room_status(date, mode, f.result()[r], time),
+            )
+            row = clip_row(row, width)
+            for line_no in positions[room]:
+                up = total - line_no
+                sys.stdout.write(f"\x1b[{up}F\x1b[2K{row}\x1b[{up}E")
+        sys.stdout.flush()
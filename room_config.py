@@ -0,0 +1,106 @@
+"""Module de lecture des fichiers de configuration de salles.
+
+Un fichier de config contient une salle par ligne, des titres (« # »), des
+sous-titres (« ## ») et des lignes vides. Il est analysé une seule fois en
+une liste d'entrées (type, texte) ; la forme compilée est gardée en mémoire
+et réutilisée tant que le fichier n'a pas été modifié (clé : chemin, mtime).
+Si un catalogue local des salles existe, chaque salle est remplacée par son
+identifiant CELCAT exact ; les noms inconnus ou ambigus sont signalés dans
+`warnings`.
+"""
+
+import os
+import threading
+
+BLANK = "blank"
+TITLE = "title"
+SUBTITLE = "subtitle"
+ROOM = "room"
+
+_compiled = {}
+_compiled_lock = threading.Lock()
+
+
+def parse_line(line):
+    """Type et texte d'une ligne de config (sans fin de ligne)."""
+    if line.strip() == "":
+        return BLANK, ""
+    if line.startswith("##"):
+        return SUBTITLE, line[2:].strip()
+    if line.startswith("#"):
+        return TITLE, line[1:].strip()
+    return ROOM, line
+
+
+class RoomConfig:
+    """Fichier de config compilé : entrées dans l'ordre, salles et largeur."""
+
+    def __init__(self, entries, path=None, mtime=None):
+        self.entries = entries
+        self.path = path
+        self.mtime = mtime
+        self.rooms = []
+        self.max_len = 0
+        for kind, text in entries:
+            if kind == ROOM:
+                self.rooms.append(text)
+                self.max_len = max(self.max_len, len(text))
+        self.unique_rooms = list(dict.fromkeys(self.rooms))
+        self.warnings = []
+
+    @classmethod
+    def from_lines(cls, lines, path=None, mtime=None):
+        """Compile une suite de lignes de config."""
+        return cls([parse_line(line.rstrip("\r\n")) for line in lines], path, mtime)
+
+    def resolved(self, catalog):
+        """Copie de la config dont les salles sont résolues avec `catalog`."""
+        entries = []
+        warnings = []
+        for kind, text in self.entries:
+            if kind == ROOM:
+                try:
+                    text = catalog.resolve(text)
+                except KeyError:
+                    warnings.append(f"salle absente du catalogue : {text!r}")
+                except ValueError as err:
+                    warnings.append(str(err))
+            entries.append((kind, text))
+        config = RoomConfig(entries, self.path, self.mtime)
+        config.warnings = warnings
+        return config
+
+    @property
+    def name(self):
+        """Nom du fichier de config."""
+        return os.path.basename(self.path) if self.path else ""
+
+    def __len__(self):
+        return len(self.rooms)
+
+
+def load_config(path, resolve=True):
+    """Retourne la config compilée de `path`, analysée une fois par version.
+
+    Avec `resolve`, les salles sont résolues avec le catalogue local (voir
+    catalog.local_catalog), une fois par version du fichier et du catalogue.
+    """
+    mtime = os.stat(path).st_mtime_ns
+    key = os.path.abspath(path)
+    catalog = None
+    if resolve:
+        from catalog import local_catalog  # pylint: disable=import-outside-toplevel
+
+        catalog = local_catalog()
+    version = (mtime, catalog.fetched_at if catalog is not None else None)
+    with _compiled_lock:
+        cached = _compiled.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+    with open(path, "r", encoding="utf-8") as f:
+        config = RoomConfig.from_lines(f, path, mtime)
+    if catalog is not None:
+        config = config.resolved(catalog)
+    with _compiled_lock:
+        _compiled[key] = (version, config)
+    return config
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""Serveur HTTP local : flux ICS et disponibilité des salles en JSON.
+
+Routes :
+- /ics/<module|room|group>/<id>?period=week&date=AAAA-MM-JJ
+- /availability?config=<fichier>&date=AAAA-MM-JJ[&time=HH:MM]
+"""
+
+import argparse
+import email.utils
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import cache
+import transport
+from celcat2ics import PERIOD_TO_VIEW, RES_TYPES, fetch_events
+from ics_utils import ics_bytes, ics_state
+from room_availability import rooms_statuses
+from room_config import load_config
+
+CONFIG_DIR = "configs"
+REFRESH_AFTER = 5 * 60
+EXPIRE_AFTER = 60 * 60
+
+
+class SingleFlight:
+    """Regroupe les appels concurrents de même clé en un seul calcul."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """Exécute `fn` une seule fois pour tous les appelants simultanés de `key`."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+        if not leader:
+            return call.result()
+        try:
+            result = fn()
+        except BaseException as err:
+            call.set_exception(err)
+            raise
+        else:
+            call.set_result(result)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return result
+
+
+class Entry:
+    """Réponse en cache."""
+
+    __slots__ = ("body", "content_type", "etag", "fetched", "accessed", "compute")
+
+    def __init__(self, body, content_type, compute):
+        self.body = body
+        self.content_type = content_type
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        self.fetched = time.time()
+        self.accessed = time.monotonic()
+        self.compute = compute
+
+
+class ResponseCache:
+    """Cache mémoire des réponses, rafraîchi en arrière-plan.
+
+    `compute(previous_body)` produit (corps, type) ; les entrées servies
+    récemment sont recalculées toutes les `refresh_after` secondes par un
+    thread de fond, celles qui ne sont plus demandées depuis `expire_after`
+    secondes sont oubliées.
+    """
+
+    def __init__(self, refresh_after=REFRESH_AFTER, expire_after=EXPIRE_AFTER):
+        self.refresh_after = refresh_after
+        self.expire_after = expire_after
+        self._entries = {}
+        self._flight = SingleFlight()
+        self._stop = threading.Event()
+
+    def _load(self, key, compute):
+        """Calcule une entrée et la range dans le cache."""
+        previous = self._entries.get(key)
+        body, content_type = compute(previous.body if previous else None)
+        entry = Entry(body, content_type, compute)
+        if previous is not None:
+            entry.accessed = previous.accessed
+        self._entries[key] = entry
+        return entry
+
+    def get(self, key, compute):
+        """Retourne l'entrée de `key`, en la calculant une seule fois si absente."""
+        entry = self._entries.get(key)
+        if entry is None or time.time() - entry.fetched > self.expire_after:
+            entry = self._flight.do(key, lambda: self._load(key, compute))
+        entry.accessed = time.monotonic()
+        return entry
+
+    def refresh_stale(self):
+        """Recalcule les entrées trop anciennes et oublie celles inutilisées.
+
+        Le recalcul ignore le cache SQLite en lecture (comme --refresh) :
+        sinon il y relirait la même réponse tant qu'elle y est valide.
+        """
+        now = time.monotonic()
+        for key, entry in list(self._entries.items()):
+            if now - entry.accessed > self.expire_after:
+                self._entries.pop(key, None)
+            elif time.time() - entry.fetched >= self.refresh_after:
+                try:
+                    with cache.overridden(refresh=True):
+                        self._flight.do(
+                            key, lambda k=key, e=entry: self._load(k, e.compute)
+                        )
+                except Exception:  # pylint: disable=broad-exception-caught
+                    pass
+
+    def start_refresher(self):
+        """Lance le thread de rafraîchissement en arrière-plan."""
+
+        def loop():
+            while not self._stop.wait(max(1, self.refresh_after / 4)):
+                self.refresh_stale()
+
+        threading.Thread(target=loop, daemon=True).start()
+
+    def stop(self):
+        """Arrête le thread de rafraîchissement."""
+        self._stop.set()
+
+
+def ics_response(entity_type, entity_id, period, date):
+    """Fonction de calcul d'un flux ICS (DTSTAMP conservés d'un calcul à l'autre)."""
+
+    def compute(previous_body):
+        previous = {}
+        if previous_body:
+            previous = ics_state(previous_body.decode("utf-8").splitlines())
+        events = fetch_events(period, date, entity_type, entity_id)
+        return ics_bytes(events, previous), "text/calendar; charset=utf-8"
+
+    return compute
+
+
+def availability_response(cfg_path, date, time_str=None):
+    """Fonction de calcul de la disponibilité des salles d'une config en JSON."""
+
+    def compute(_previous_body):
+        config = load_config(cfg_path)
+        mode = 0 if time_str is None else 1
+        statuses = rooms_statuses(date, config.unique_rooms, mode, time_str)
+        result = []
+        for room in config.unique_rooms:
+            status = statuses[room]
+            if isinstance(status, Exception):
+                result.append({"room": room, "error": str(status)})
+            elif mode == 0:
+                result.append(
+                    {
+                        "room": room,
+                        "morning_busy": status[0],
+                        "afternoon_busy": status[1],
+                    }
+                )
+            else:
+                result.append(
+                    {"room": room, "available": status[0], "until": status[1]}
+                )
+        body = {"date": date, "time": time_str, "rooms": result}
+        return (
+            json.dumps(body, ensure_ascii=False).encode("utf-8"),
+            "application/json; charset=utf-8",
+        )
+
+    return compute
+
+
+class CelcatHandler(BaseHTTPRequestHandler):
+    """Gestionnaire des routes /ics et /availability."""
+
+    server_version = "UVSQ-celcat"
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Traite une requête GET."""
+        url = urlsplit(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        parts = [unquote(p) for p in url.path.split("/") if p]
+        try:
+            if len(parts) == 3 and parts[0] == "ics":
+                key, compute = self.route_ics(parts[1], parts[2], params)
+            elif parts == ["availability"]:
+                key, compute = self.route_availability(params)
+            else:
+                self.send_error(404)
+                return
+        except ValueError as err:
+            self.send_error(400, explain=str(err))
+            return
+        try:
+            entry = self.server.cache.get(key, compute)
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            self.send_error(502, explain=f"CELCAT : {err}")
+            return
+        self.send_entry(entry)
+
+    def route_ics(self, entity_type, entity_id, params):
+        """Clé et calcul d'un flux ICS."""
+        if entity_type not in RES_TYPES:
+            raise ValueError(f"type inconnu : {entity_type}")
+        period = params.get("period", "week")
+        if period not in PERIOD_TO_VIEW:
+            raise ValueError(f"période inconnue : {period}")
+        date = params.get("date") or datetime.now().date().isoformat()
+        datetime.fromisoformat(date)
+        key = ("ics", entity_type, entity_id, period, date)
+        return key, ics_response(entity_type, entity_id, period, date)
+
+    def route_availability(self, params):
+        """Clé et calcul de la disponibilité d'une config."""
+        cfg = os.path.basename(params.get("config", ""))
+        cfg_path = os.path.join(self.server.config_dir, cfg)
+        if not cfg or not os.path.isfile(cfg_path):
+            raise ValueError(f"config introuvable : {cfg}")
+        date = params.get("date") or datetime.now().date().isoformat()
+        datetime.fromisoformat(date)
+        time_str = params.get("time")
+        if time_str is not None:
+            datetime.strptime(time_str, "%H:%M")
+        key = ("availability", cfg, date, time_str)
+        return key, availability_response(cfg_path, date, time_str)
+
+    def send_entry(self, entry):
+        """Envoie une entrée du cache, ou 304 si l'ETag du client correspond."""
+        etags = [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]
+        last_modified = email.utils.formatdate(entry.fetched, usegmt=True)
+        if entry.etag in etags or "*" in etags:
+            self.send_response(304)
+            self.send_header("ETag", entry.etag)
+            self.send_header("Last-Modified", last_modified)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", entry.content_type)
+        self.send_header("Content-Length", str(len(entry.body)))
+        self.send_header("ETag", entry.etag)
+        self.send_header("Last-Modified", last_modified)
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(entry.body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """Journalise sur la sortie d'erreur, sauf si le serveur est silencieux."""
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+class CelcatServer(ThreadingHTTPServer):
+    """Serveur HTTP multi-thread partageant un cache de réponses."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address,
+        config_dir=CONFIG_DIR,
+        refresh_after=REFRESH_AFTER,
+        quiet=False,
+    ):
+        super().__init__(address, CelcatHandler)
+        self.config_dir = config_dir
+        self.quiet = quiet
+        self.cache = ResponseCache(refresh_after=refresh_after)
+        self.cache.start_refresher()
+
+    def server_close(self):
+        self.cache.stop()
+        super().server_close()
+
+
+def serve(host="127.0.0.1", port=8080, **options):
+    """Lance le serveur jusqu'à interruption."""
+    httpd = CelcatServer((host, port), **options)
+    print(f"Serveur sur http://{host}:{httpd.server_port}/")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+
+def main(argv=None):
+    """Point d'entrée en ligne de commande."""
+    parser = argparse.ArgumentParser(description="Serveur local ICS/disponibilité")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--upstream", help="URL de base de CELCAT (tests)")
+    parser.add_argument("--refresh-after", type=int, default=REFRESH_AFTER)
+    parser.add_argument("--config-dir", default=CONFIG_DIR)
+    args = parser.parse_args(argv)
+    if args.upstream:
+        transport.configure(base_url=args.upstream)
+    serve(
+        args.host,
+        args.port,
+        config_dir=args.config_dir,
+        refresh_after=args.refresh_after,
+    )
+
+
+if __name__ == "__main__":
+    main()
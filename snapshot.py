@@ -0,0 +1,295 @@
+"""Module d'instantané colonnaire des réservations de salles d'un semestre.
+
+Un instantané est un répertoire contenant :
+- rooms.npy, modules.npy, types.npy : indices (int32) dans la table de
+  chaînes ;
+- start.npy, end.npy : débuts et fins en secondes epoch (int64, UTC) ;
+- strings.json : table de chaînes et métadonnées (plage, salles, erreurs).
+
+Les tableaux sont ouverts en mémoire projetée (mmap) : les requêtes
+(taux d'occupation, créneaux les plus chargés, salles jamais utilisées un
+jour donné) se font sans réseau et sans objet par événement.
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    np = None
+
+from celcat2ics import month_start_end
+from occupancy_matrix import DAY_NAMES, minutes, require_numpy
+from room_availability import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_WORKERS,
+    chunks,
+    rooms_range_events,
+)
+
+SNAPSHOT_DIR = "snapshots"
+COLUMNS = ("rooms", "modules", "types", "start", "end")
+DAY_START = "08:00"
+DAY_END = "18:40"
+
+
+def semester_range(date_str):
+    """Premier et dernier jour du semestre contenant `date_str`.
+
+    Semestre 1 : septembre à janvier ; semestre 2 : février à juillet.
+    """
+    d = date.fromisoformat(date_str)
+    if d.month >= 9:
+        return date(d.year, 9, 1), date(d.year + 1, 1, 31)
+    if d.month == 1:
+        return date(d.year - 1, 9, 1), date(d.year, 1, 31)
+    return date(d.year, 2, 1), date(d.year, 7, 31)
+
+
+def month_ranges(first, last):
+    """Plages mensuelles [début, fin) couvrant [first, last]."""
+    ranges = []
+    y, m = first.year, first.month
+    while (y, m) <= (last.year, last.month):
+        s, e = month_start_end(y, m)
+        s = max(date.fromisoformat(s), first)
+        e = min(date.fromisoformat(e), last)
+        ranges.append((s.isoformat(), (e + timedelta(days=1)).isoformat()))
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return ranges
+
+
+def epoch(dt):
+    """Secondes epoch d'un datetime UTC."""
+    return int(dt.timestamp())
+
+
+class StringTable:
+    """Table de chaînes : chaque chaîne distincte reçoit un indice entier."""
+
+    def __init__(self, strings=()):
+        self.strings = list(strings)
+        self.index = {s: i for i, s in enumerate(self.strings)}
+
+    def id(self, value):
+        """Indice de `value`, ajoutée à la table si besoin."""
+        value = value or ""
+        i = self.index.get(value)
+        if i is None:
+            i = self.index[value] = len(self.strings)
+            self.strings.append(value)
+        return i
+
+
+def build_snapshot(
+    rooms,
+    first,
+    last,
+    out_dir,
+    workers=DEFAULT_WORKERS,
+    batch_size=DEFAULT_BATCH_SIZE,
+):
+    """Récupère les réservations des salles sur [first, last] et écrit l'instantané.
+
+    Chaque lot de salles est récupéré mois par mois (vue mois) ; les Event
+    d'un lot sont encodés en colonnes aussitôt, puis abandonnés. Une
+    réservation présente dans deux mois n'est gardée qu'une fois.
+    Retourne le nombre de réservations écrites.
+    """
+    require_numpy()
+    rooms = list(dict.fromkeys(rooms))
+    table = StringTable()
+    columns = {name: [] for name in COLUMNS}
+    seen = set()
+    errors = {}
+    jobs = [
+        (s, e, chunk)
+        for s, e in month_ranges(first, last)
+        for chunk in chunks(rooms, batch_size)
+    ]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [
+            (chunk, pool.submit(rooms_range_events, s, e, "month", chunk))
+            for s, e, chunk in jobs
+        ]
+        for chunk, future in futures:
+            try:
+                result = future.result()
+            except Exception as err:  # pylint: disable=broad-exception-caught
+                result = {room: err for room in chunk}
+            for room, events in result.items():
+                if isinstance(events, Exception):
+                    errors[room] = str(events)
+                    continue
+                room_id = table.id(room)
+                for ev in events:
+                    if not ev.start or not ev.end:
+                        continue
+                    key = (ev.id, room_id, ev.start)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    columns["rooms"].append(room_id)
+                    columns["modules"].append(table.id(ev.name))
+                    columns["types"].append(table.id(ev.type))
+                    columns["start"].append(epoch(ev.start))
+                    columns["end"].append(epoch(ev.end))
+    os.makedirs(out_dir, exist_ok=True)
+    for name in COLUMNS:
+        dtype = np.int64 if name in ("start", "end") else np.int32
+        np.save(os.path.join(out_dir, f"{name}.npy"), np.array(columns[name], dtype))
+    meta = {
+        "first": first.isoformat(),
+        "last": last.isoformat(),
+        "created": time.time(),
+        "rooms": [table.id(room) for room in rooms],
+        "errors": errors,
+        "strings": table.strings,
+    }
+    tmp_path = os.path.join(out_dir, "strings.json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp_path, os.path.join(out_dir, "strings.json"))
+    return len(columns["start"])
+
+
+class Snapshot:
+    """Instantané chargé : colonnes en mémoire projetée et table de chaînes."""
+
+    def __init__(self, path):
+        require_numpy()
+        with open(os.path.join(path, "strings.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.path = path
+        self.strings = meta["strings"]
+        self.first = date.fromisoformat(meta["first"])
+        self.last = date.fromisoformat(meta["last"])
+        self.room_ids = meta["rooms"]
+        self.errors = meta.get("errors", {})
+        for name in COLUMNS:
+            setattr(
+                self, name, np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            )
+
+    def __len__(self):
+        return len(self.start)
+
+    def complete_rooms(self):
+        """Indices des salles dont tous les mois ont été récupérés."""
+        return [r for r in self.room_ids if self.strings[r] not in self.errors]
+
+    def weekdays(self):
+        """Jour de la semaine de chaque réservation (0 = lundi)."""
+        return (self.start // 86400 + 3) % 7
+
+    def working_days(self, weekday=None):
+        """Nombre de jours ouvrés (hors dimanche) de la plage, ou d'un jour donné."""
+        n = 0
+        day = self.first
+        while day <= self.last:
+            if day.weekday() != 6 and weekday in (None, day.weekday()):
+                n += 1
+            day += timedelta(days=1)
+        return n
+
+    def occupancy_rate(self, day_start=DAY_START, day_end=DAY_END):
+        """Taux d'occupation de chaque salle dans la fenêtre horaire quotidienne.
+
+        Les réservations sont bornées à la fenêtre de leur jour ; des
+        réservations simultanées d'une même salle sont comptées une fois
+        chacune (le taux est alors plafonné à 1). Retourne {salle: taux}, sans
+        les salles en erreur (données incomplètes, voir complete_rooms).
+        """
+        day = self.start // 86400 * 86400
+        lo = day + minutes(day_start) * 60
+        hi = day + minutes(day_end) * 60
+        busy = np.clip(np.minimum(self.end, hi) - np.maximum(self.start, lo), 0, None)
+        per_room = np.bincount(self.rooms, weights=busy, minlength=len(self.strings))
+        capacity = self.working_days() * (minutes(day_end) - minutes(day_start)) * 60
+        rooms = self.complete_rooms()
+        if not capacity:
+            return {self.strings[r]: 0.0 for r in rooms}
+        return {self.strings[r]: min(1.0, float(per_room[r]) / capacity) for r in rooms}
+
+    def busiest_slots(self, slot_minutes=60, top=10):
+        """Créneaux hebdomadaires les plus chargés.
+
+        Retourne une liste de (jour, heure HH:MM, nombre moyen de salles
+        occupées), du plus chargé au moins chargé.
+        """
+        per_day = 1440 // slot_minutes
+        weekday = self.weekdays()
+        first = (self.start % 86400) // 60 // slot_minutes
+        last = -(-((self.end - self.start // 86400 * 86400) // 60) // slot_minutes)
+        last = np.minimum(last, per_day)
+        diff = np.zeros(7 * (per_day + 1), dtype=np.int64)
+        np.add.at(diff, weekday * (per_day + 1) + first, 1)
+        np.add.at(diff, weekday * (per_day + 1) + last, -1)
+        load = np.cumsum(diff.reshape(7, per_day + 1), axis=1)[:, :per_day]
+        days = np.array([max(1, self.working_days(d)) for d in range(7)])
+        mean = load / days[:, None]
+        order = np.argsort(-mean, axis=None, kind="stable")[:top]
+        result = []
+        for flat in order:
+            d, s = divmod(int(flat), per_day)
+            if mean[d, s] <= 0:
+                break
+            hhmm = f"{s * slot_minutes // 60:02d}:{s * slot_minutes % 60:02d}"
+            result.append((DAY_NAMES[d], hhmm, round(float(mean[d, s]), 2)))
+        return result
+
+    def unused_on(self, weekday):
+        """Salles sans aucune réservation le jour `weekday` (0 = lundi).
+
+        Les salles en erreur en sont exclues : l'absence de réservation n'y
+        prouve rien.
+        """
+        used = np.unique(np.asarray(self.rooms)[self.weekdays() == weekday])
+        used = set(used.tolist())
+        return [self.strings[r] for r in self.complete_rooms() if r not in used]
+
+
+def snapshot_path(name):
+    """Répertoire d'un instantané, donné tel quel ou relatif à snapshots/."""
+    if os.path.isdir(name) or os.sep in name:
+        return name
+    return os.path.join(SNAPSHOT_DIR, name)
+
+
+def default_name(config_name, first, last):
+    """Nom par défaut d'un instantané."""
+    base = os.path.splitext(config_name)[0]
+    return f"{base}_{first:%Y%m%d}-{last:%Y%m%d}"
+
+
+def print_report(path, weekday=4, top=10):
+    """Affiche les indicateurs d'un instantané (sans accès réseau)."""
+    t0 = time.perf_counter()
+    snap = Snapshot(path)
+    rates = snap.occupancy_rate()
+    slots = snap.busiest_slots(top=top)
+    unused = snap.unused_on(weekday)
+    elapsed = (time.perf_counter() - t0) * 1000
+    width = max((len(room) for room in rates), default=0)
+    print(f"{len(snap)} réservations du {snap.first} au {snap.last}")
+    print("\nTaux d'occupation (08:00-18:40) :")
+    for room, rate in sorted(rates.items(), key=lambda item: -item[1]):
+        print(f"  {room.ljust(width)}  {rate * 100:5.1f} %")
+    print("\nCréneaux les plus chargés (salles occupées en moyenne) :")
+    for day_name, hhmm, mean in slots:
+        print(f"  {day_name} {hhmm}  {mean}")
+    print(f"\nSalles jamais utilisées le {DAY_NAMES[weekday]} : {len(unused)}")
+    for room in unused:
+        print(f"  {room}")
+    if snap.errors:
+        print(
+            "\nSalles en erreur lors de la construction, exclues des taux et des "
+            f"salles inutilisées : {len(snap.errors)}"
+        )
+        for room, error in sorted(snap.errors.items()):
+            print(f"  {room} : {error}")
+    print(f"\n({elapsed:.1f} ms)")
@@ -0,0 +1,269 @@
+"""Module de transport HTTP partagé vers CELCAT (connexions persistantes, gzip)."""
+
+import gzip
+import http.client
+import json
+import os
+import threading
+import time
+import urllib.parse
+import zlib
+
+import limiter
+from metrics import get_metrics
+
+BASE_URL = os.environ.get("CELCAT_URL", "https://edt.uvsq.fr")
+DEFAULT_TIMEOUT = (5, 30)
+DEFAULT_POOL_SIZE = 8
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0",
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
+}
+
+_instance = None
+_instance_lock = threading.Lock()
+_options = {}
+
+
+class HTTPError(Exception):
+    """Erreur HTTP (statut >= 400) renvoyée par le serveur."""
+
+    def __init__(self, status, reason, url, retry_after=None):
+        super().__init__(f"HTTP {status} {reason} : {url}")
+        self.status = status
+        self.reason = reason
+        self.url = url
+        self.retry_after = retry_after
+
+
+class Response:
+    """Réponse HTTP entièrement lue et décompressée."""
+
+    def __init__(self, status, reason, headers, body, url, endpoint=None):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+        self.url = url
+        self.endpoint = endpoint
+
+    def text(self):
+        """Décode le corps selon le charset annoncé (utf-8 par défaut)."""
+        charset = self.headers.get_content_charset() or "utf-8"
+        return self.body.decode(charset, errors="replace")
+
+    def json(self):
+        """Décode le corps en JSON (durée enregistrée dans la phase decode)."""
+        t0 = time.perf_counter()
+        data = json.loads(self.text())
+        if self.endpoint:
+            get_metrics().observe(self.endpoint, "decode", time.perf_counter() - t0)
+        return data
+
+    def raise_for_status(self):
+        """Lève HTTPError si le statut est une erreur."""
+        if self.status >= 400:
+            retry_after = self.headers.get("Retry-After")
+            try:
+                retry_after = float(retry_after) if retry_after else None
+            except ValueError:
+                retry_after = None
+            raise HTTPError(self.status, self.reason, self.url, retry_after)
+
+
+def decompress(body, encoding):
+    """Décompresse un corps selon son Content-Encoding."""
+    encoding = (encoding or "").strip().lower()
+    if encoding in ("gzip", "x-gzip"):
+        return gzip.decompress(body)
+    if encoding == "deflate":
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            return zlib.decompress(body, -zlib.MAX_WBITS)
+    return body
+
+
+class Transport:
+    """Client HTTP réutilisant des connexions keep-alive vers un même hôte.
+
+    `timeout` est soit un nombre de secondes, soit un couple
+    (connexion, lecture). Les connexions inactives sont conservées dans un
+    pool de `pool_size` connexions partagé entre threads.
+    """
+
+    def __init__(
+        self, base_url=BASE_URL, timeout=DEFAULT_TIMEOUT, pool_size=DEFAULT_POOL_SIZE
+    ):
+        parsed = urllib.parse.urlsplit(base_url)
+        self.base_url = base_url.rstrip("/")
+        self.scheme = parsed.scheme or "https"
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.prefix = parsed.path.rstrip("/")
+        if isinstance(timeout, (tuple, list)):
+            self.connect_timeout, self.read_timeout = timeout
+        else:
+            self.connect_timeout = self.read_timeout = timeout
+        self.pool_size = pool_size
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _new_connection(self):
+        """Ouvre une nouvelle connexion vers l'hôte."""
+        cls = (
+            http.client.HTTPSConnection
+            if self.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        conn = cls(self.host, self.port, timeout=self.connect_timeout)
+        conn.connect()
+        conn.sock.settimeout(self.read_timeout)
+        return conn
+
+    def _acquire(self):
+        """Retourne une connexion inactive du pool, ou None."""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return None
+
+    def _release(self, conn):
+        """Remet une connexion dans le pool, ou la ferme si le pool est plein."""
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def url(self, path, params=None):
+        """Construit l'URL complète d'un chemin."""
+        target = self.prefix + path
+        if params:
+            target += "?" + urllib.parse.urlencode(params)
+        return target
+
+    def request(
+        self, method, path, params=None, data=None, headers=None, idempotent=None
+    ):
+        """Envoie une requête sous le limiteur partagé et retourne la Response.
+
+        Les requêtes idempotentes (GET par défaut) sont retentées sur
+        429/5xx/timeout avec un délai exponentiel.
+        """
+        if idempotent is None:
+            idempotent = method in ("GET", "HEAD")
+        endpoint = path.rsplit("/", 1)[-1] or path
+        return limiter.call(
+            lambda: self._send(method, path, params, data, headers),
+            idempotent=idempotent,
+            on_retry=lambda err: get_metrics().inc(endpoint, "retries"),
+        )
+
+    def _send(self, method, path, params=None, data=None, headers=None):
+        """Envoie une requête (une tentative) et retourne la Response lue en entier.
+
+        Une connexion réutilisée que le serveur a fermée entre-temps est
+        remplacée par une nouvelle connexion, une seule fois.
+        """
+        target = self.url(path, params)
+        all_headers = dict(DEFAULT_HEADERS)
+        all_headers.update(headers or {})
+        body = None
+        if data is not None:
+            body = urllib.parse.urlencode(data).encode("utf-8")
+            all_headers.setdefault(
+                "Content-Type", "application/x-www-form-urlencoded; charset=UTF-8"
+            )
+        endpoint = path.rsplit("/", 1)[-1] or path
+        metrics = get_metrics()
+        t_start = time.perf_counter()
+        conn = self._acquire()
+        reused = conn is not None
+        while True:
+            try:
+                if conn is None:
+                    t0 = time.perf_counter()
+                    conn = self._new_connection()
+                    metrics.observe(endpoint, "connect", time.perf_counter() - t0)
+                t0 = time.perf_counter()
+                conn.request(method, target, body=body, headers=all_headers)
+                resp = conn.getresponse()
+                t1 = time.perf_counter()
+                raw = resp.read()
+                t2 = time.perf_counter()
+            except (http.client.RemoteDisconnected, ConnectionError):
+                if conn is not None:
+                    conn.close()
+                if not reused:
+                    metrics.inc(endpoint, "errors")
+                    raise
+                conn, reused = None, False
+                continue
+            except Exception:
+                if conn is not None:
+                    conn.close()
+                metrics.inc(endpoint, "errors")
+                raise
+            break
+        if resp.will_close:
+            conn.close()
+        else:
+            self._release(conn)
+        content = decompress(raw, resp.headers.get("Content-Encoding"))
+        t3 = time.perf_counter()
+        metrics.observe(endpoint, "ttfb", t1 - t0)
+        metrics.observe(endpoint, "download", t2 - t1)
+        metrics.observe(endpoint, "decompress", t3 - t2)
+        metrics.observe(endpoint, "total", t3 - t_start)
+        metrics.inc(endpoint, "requests")
+        metrics.inc(endpoint, "bytes", len(raw))
+        response = Response(
+            resp.status,
+            resp.reason,
+            resp.headers,
+            content,
+            self.base_url + target[len(self.prefix) :],
+            endpoint,
+        )
+        if resp.status >= 400:
+            metrics.inc(endpoint, "errors")
+        response.raise_for_status()
+        return response
+
+    def get(self, path, params=None, headers=None):
+        """Envoie une requête GET."""
+        return self.request("GET", path, params=params, headers=headers)
+
+    def post(self, path, data=None, headers=None, idempotent=False):
+        """Envoie une requête POST encodée en formulaire."""
+        return self.request(
+            "POST", path, data=data, headers=headers, idempotent=idempotent
+        )
+
+    def close(self):
+        """Ferme toutes les connexions inactives."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+def configure(**options):
+    """Modifie les options (base_url, timeout, pool_size) du transport partagé."""
+    global _instance  # pylint: disable=global-statement
+    with _instance_lock:
+        _options.update(options)
+        if _instance is not None:
+            _instance.close()
+        _instance = None
+
+
+def get_transport():
+    """Retourne le transport partagé par tous les modules."""
+    global _instance  # pylint: disable=global-statement
+    with _instance_lock:
+        if _instance is None:
+            _instance = Transport(**_options)
+        return _instance